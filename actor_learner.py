@@ -0,0 +1,219 @@
+import random, time
+import multiprocessing as mp
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS, WIN_REWARD, LOSE_REWARD
+from qtable import QTable
+from replay import STATE_COLUMNS, get_column_dtypes, replay_q_update
+from batch_env import BatchPongEnv, BALL_X, BALL_Y, VELOCITY_X, VELOCITY_Y, PADDLE1_Y, PADDLE2_Y
+from parallel import make_shared_q_table, worker_seed, get_first_eval_ep, EvalPool
+from policies import make_adversary
+from schedules import make_schedules, apply_schedules
+
+class TransitionQueue(object):
+    """Bounded queue of transition batches between one actor and the learner.
+
+    num_slots batches of batch_size transitions live in shared memory, column
+    by column like ReplayBuffer, so a batch is never pickled. put() blocks
+    while every slot is full, which holds the actor back when the learner
+    falls behind; the time it waited adds up in blocked_seconds. get()
+    returns views of the oldest batch, valid until release().
+    """
+
+    def __init__(self, num_slots, batch_size):
+        self.num_slots = num_slots
+        self.columns = {}
+        for name, dtype in get_column_dtypes():
+            raw = mp.RawArray('b', num_slots * batch_size * np.dtype(dtype).itemsize)
+            self.columns[name] = np.frombuffer(raw, dtype=dtype).reshape(num_slots, batch_size)
+        # learner version of the policy snapshot that produced each batch
+        self.versions = mp.RawArray('l', num_slots)
+        self.free = mp.Semaphore(num_slots)
+        self.filled = mp.Semaphore(0)
+        # one producer and one consumer, so each count is only written by one side
+        self.put_count = mp.RawValue('l', 0)
+        self.get_count = mp.RawValue('l', 0)
+        self.blocked_seconds = mp.RawValue('d', 0.0)
+
+    def depth(self):
+        return self.put_count.value - self.get_count.value
+
+    def put(self, states, actions, rewards, next_states, dones, version):
+        if not self.free.acquire(False):
+            start = time.time()
+            self.free.acquire()
+            self.blocked_seconds.value += time.time() - start
+        slot = self.put_count.value % self.num_slots
+        for i, name in enumerate(STATE_COLUMNS):
+            self.columns[name][slot] = states[:, i]
+            self.columns["next_" + name][slot] = next_states[:, i]
+        self.columns["action"][slot] = actions
+        self.columns["reward"][slot] = rewards
+        self.columns["done"][slot] = dones
+        self.versions[slot] = version
+        self.put_count.value += 1
+        self.filled.release()
+
+    def get(self):
+        # (columns, version) of the oldest batch, or None if the queue is empty
+        if not self.filled.acquire(False):
+            return None
+        slot = self.get_count.value % self.num_slots
+        return dict((name, column[slot]) for name, column in self.columns.items()), self.versions[slot]
+
+    def release(self):
+        self.get_count.value += 1
+        self.free.release()
+
+def select_actions(Q, states, rng):
+    # agent action indices for a batch of games, by globals.args.agent_strategy
+    if globals.args.agent_strategy == "random":
+        return rng.randint(0, len(ACTIONS), len(states))
+    actions = Q.best_actions(states[:, BALL_X], states[:, BALL_Y], states[:, VELOCITY_X], states[:, VELOCITY_Y],
+                             states[:, PADDLE1_Y], states[:, PADDLE2_Y])
+    if globals.args.agent_strategy == "epsilon_greedy":
+        explore = rng.random_sample(len(states)) < globals.args.epsilon
+        actions[explore] = rng.randint(0, len(ACTIONS), explore.sum())
+    return actions
+
+def actor(args, actor_id, first_ep, best_action, shared_Q, version, queue, train_scores, games, episodes_done, finished):
+    globals.args = args
+    random.seed(worker_seed(actor_id))
+    rng = np.random.RandomState(worker_seed(actor_id))
+
+    # the actor plays from its own copy of the table, refreshed every policy_refresh batches
+    snapshot = QTable(shared_Q.values.copy(), shared_Q.symmetric)
+    snapshot_version = version.value
+    adversary = make_adversary(args.adversary_strategy, best_action, args.adversary_refresh)
+    env = BatchPongEnv(args.actor_games)
+    episodes = list(range(first_ep + actor_id, args.train_episodes, args.actors))
+    schedules = make_schedules()
+    num_done = 0
+    games_won = 0
+    games_lost = 0
+
+    batches = 0
+    while num_done < len(episodes):
+        if batches > 0 and batches % args.policy_refresh == 0:
+            snapshot_version = version.value
+            snapshot.values[:] = shared_Q.values
+
+        apply_schedules(schedules, episodes[num_done])
+        states = env.states.copy()
+        agent_actions = select_actions(snapshot, states, rng)
+        adversary_actions = adversary.act_batch(snapshot, env.encode(), rng)
+        next_states, rewards, dones, scores = env.step(agent_actions, adversary_actions)
+        queue.put(states, agent_actions, rewards, next_states, dones, snapshot_version)
+        batches += 1
+
+        games_won += int((rewards == WIN_REWARD).sum())
+        games_lost += int((rewards == LOSE_REWARD).sum())
+        for score in scores[:len(episodes) - num_done]:
+            train_scores[episodes[num_done] - first_ep] = score
+            num_done += 1
+            adversary.episode_done(snapshot)
+        episodes_done[actor_id] = num_done
+
+    games[2 * actor_id] = games_won
+    games[2 * actor_id + 1] = games_lost
+    finished[actor_id] = 1
+
+def actor_learner_q_learning(best_action, evaluate_policy, initial_Q=None, first_ep=0):
+    """Train with globals.args.actors actor processes feeding one learner.
+
+    Each actor steps actor_games games at once with BatchPongEnv and pushes
+    every tick as one batch through its TransitionQueue. The learner, this
+    process, drains the queues and applies each batch as one vectorized Q
+    update to the shared table the actors copy their policy from. Every
+    actor_stats_every batches it prints the queue depths, how long actors
+    were blocked on full queues and the policy lag: how many learner updates
+    the snapshot a batch was played with was behind. Like a resumed
+    single-process run, initial_Q was trained for first_ep episodes and
+    training goes on up to train_episodes.
+    """
+    if globals.args.seed is None:
+        globals.args.seed = int(time.time())
+
+    num_actors = globals.args.actors
+    symmetric = initial_Q.symmetric if initial_Q is not None else globals.args.symmetric
+    shared_Q = make_shared_q_table(symmetric)
+    if initial_Q is not None:
+        shared_Q.values[:] = initial_Q.values
+    version = mp.RawValue('l', 0)
+    queues = [TransitionQueue(globals.args.queue_size, globals.args.actor_games) for _ in range(num_actors)]
+    train_scores = mp.RawArray('d', max(globals.args.train_episodes - first_ep, 0))
+    games = mp.RawArray('l', 2 * num_actors)
+    episodes_done = mp.RawArray('l', num_actors)
+    finished = mp.RawArray('l', num_actors)
+
+    actors = [
+        mp.Process(target=actor, args=(globals.args, actor_id, first_ep, best_action, shared_Q, version, queues[actor_id],
+                                       train_scores, games, episodes_done, finished))
+        for actor_id in range(num_actors)
+    ]
+    for process in actors:
+        process.start()
+
+    eval_scores = []
+    eval_pool = None
+    if globals.args.eval_workers > 0:
+        eval_pool = EvalPool(evaluate_policy, globals.args.eval_workers)
+    eval_ep = get_first_eval_ep(first_ep)
+
+    schedules = make_schedules()
+    weights = np.ones(globals.args.actor_games)
+    start = time.time()
+    lag_sum = 0
+    lag_max = 0
+    while True:
+        received = 0
+        for queue in queues:
+            item = queue.get()
+            if item is None:
+                continue
+            columns, batch_version = item
+            apply_schedules(schedules, first_ep + sum(episodes_done))
+            lag = version.value - batch_version
+            lag_sum += lag
+            lag_max = max(lag_max, lag)
+            replay_q_update(shared_Q, columns, weights, globals.args.learning_rate, globals.args.discount)
+            queue.release()
+            version.value += 1
+            received += 1
+
+            if version.value % globals.args.actor_stats_every == 0:
+                print("Learner: %d batches  %.0f transitions/s  queue depth %s  actors blocked %.1f s  "
+                      "policy lag mean %.1f max %d" % (
+                          version.value, version.value * globals.args.actor_games / (time.time() - start),
+                          [queue.depth() for queue in queues], sum(queue.blocked_seconds.value for queue in queues),
+                          lag_sum / float(globals.args.actor_stats_every), lag_max))
+                lag_sum = 0
+                lag_max = 0
+
+        # evaluate the greedy policy every eval_every finished episodes
+        while eval_ep < min(first_ep + sum(episodes_done), globals.args.train_episodes):
+            if eval_pool is None:
+                eval_scores.append(evaluate_policy(shared_Q))
+            else:
+                # shared memory is not copied on fork, the evaluation gets a snapshot of its own
+                eval_pool.submit(QTable(shared_Q.values.copy(), shared_Q.symmetric))
+            eval_ep += globals.args.eval_every
+
+        if received == 0:
+            # the actors set finished after their last put, so empty queues then mean all was learned
+            if all(finished) and all(queue.depth() == 0 for queue in queues):
+                break
+            time.sleep(0.001)
+
+    for process in actors:
+        process.join()
+    if eval_pool is not None:
+        eval_scores = eval_pool.close()
+
+    games_won = sum(games[0::2])
+    games_lost = sum(games[1::2])
+    return shared_Q, list(train_scores), eval_scores, games_won, games_lost
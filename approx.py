@@ -0,0 +1,135 @@
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+
+class TileCodingQ(object):
+    """Linear Q over tile-coded features of the state, for boards too big for a table.
+
+    A state is reduced to features relative to the agent's paddle: the ball's
+    distance to it along x, the ball's height relative to it, the ball's
+    height on the board (wall proximity) and the signs of the ball's velocity.
+    num_tilings grids of num_tiles cells per feature, each shifted by a
+    fraction of a cell, cover the three distances, with one set of grids per
+    velocity sign pair. Q(state, action) is the sum of the weights of the cell
+    the state falls in on every grid, so memory depends only on num_tilings
+    and num_tiles, not on the board.
+
+    Supports Q[(state, action)] reads and the best_action/update calls of
+    QTable, plus best_actions and batch_update over NumPy arrays of states.
+    """
+
+    def __init__(self, num_tilings=8, num_tiles=8):
+        self.num_tilings = num_tilings
+        self.num_tiles = num_tiles
+        # a shifted grid needs one more cell per feature to cover [0, num_tiles]
+        grid_size = num_tiles + 1
+        self.tiling_size = 4 * grid_size ** 3
+        self.velocity_stride = grid_size ** 3
+        self.weights = np.zeros((num_tilings * self.tiling_size, len(ACTIONS)), dtype=np.float32)
+
+        # the features only depend on ball_x, ball_y and ball_y - paddle2_y, so the
+        # cells they fall in on each grid are looked up instead of computed:
+        # the row of weights active on grid t is x_tiles[ball_x, t] +
+        # dy_tiles[ball_y - paddle2_y + paddle_dy_shift, t] + y_tiles[ball_y, t] + velocity part
+        width, height = globals.args.board_width, globals.args.board_height
+        # shifts of each grid along the three features, as fractions of a cell
+        offsets = np.array([[((2 * feature + 1) * tiling % num_tilings) / float(num_tilings) for feature in range(3)]
+                            for tiling in range(num_tilings)])
+        x = (width - 1 - np.arange(width)) * (num_tiles / float(width - 1))
+        # ball_y - paddle2_y runs from -(height - 1) to height - 1
+        self.paddle_dy_shift = height - 1
+        dy = np.arange(2 * height - 1) * (num_tiles / float(2 * (height - 1)))
+        y = np.arange(height) * (num_tiles / float(height - 1))
+        self.x_tiles = (np.arange(num_tilings) * self.tiling_size +
+                        (x[:, None] + offsets[:, 0]).astype(np.int64) * grid_size * grid_size)
+        self.dy_tiles = (dy[:, None] + offsets[:, 1]).astype(np.int64) * grid_size
+        self.y_tiles = (y[:, None] + offsets[:, 2]).astype(np.int64)
+        # the scalar calls of the training loop are cheaper on Python lists than on small arrays
+        self.x_tile_lists = self.x_tiles.tolist()
+        self.dy_tile_lists = self.dy_tiles.tolist()
+        self.y_tile_lists = self.y_tiles.tolist()
+
+    def get_tiles(self, state):
+        # rows of weights active in state, one per grid
+        velocity = (2 * (state[2] > 0) + (state[3] > 0)) * self.velocity_stride
+        return [x + dy + y + velocity for x, dy, y in zip(self.x_tile_lists[state[0]],
+                                                          self.dy_tile_lists[state[1] - state[7] + self.paddle_dy_shift],
+                                                          self.y_tile_lists[state[1]])]
+
+    def get_batch_tiles(self, ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y):
+        # vectorized get_tiles: an (N, num_tilings) array of rows
+        velocity = 2 * (velocity_x > 0) + (velocity_y > 0)
+        return (self.x_tiles[ball_x] + self.dy_tiles[ball_y - paddle2_y + self.paddle_dy_shift] +
+                self.y_tiles[ball_y] + (velocity * self.velocity_stride)[:, None])
+
+    def is_final(self, ball_x):
+        # the ball reached a paddle's column: a point was scored, nothing to bootstrap from
+        return (ball_x == 0) | (ball_x == globals.args.board_width - 1)
+
+    def get_values(self, tiles):
+        item = self.weights.item
+        return [sum([item(tile, action) for tile in tiles]) for action in range(len(ACTIONS))]
+
+    def __getitem__(self, key):
+        state, action = key
+        return self.get_values(self.get_tiles(state))[ACTIONS.index(action)]
+
+    def __contains__(self, key):
+        return True
+
+    def __len__(self):
+        return self.weights.size
+
+    def best_action(self, state, legal_actions):
+        values = self.get_values(self.get_tiles(state))
+        best_action = None
+        max_value = -99999
+        for action in legal_actions:
+            value = values[ACTIONS.index(action)]
+            if value > max_value:
+                max_value = value
+                best_action = action
+        return best_action
+
+    def best_actions(self, ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y):
+        # vectorized best_action: indices into ACTIONS
+        tiles = self.get_batch_tiles(ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y)
+        return self.weights[tiles].sum(axis=1).argmax(axis=1)
+
+    def update(self, state, action, reward, next_state, learning_rate, discount):
+        # one gradient step of Q-learning, shared between the grids; returns the change of Q(state, action)
+        tiles = self.get_tiles(state)
+        action_index = ACTIONS.index(action)
+        weights = self.weights
+        target = reward
+        if not self.is_final(next_state[0]):
+            target += discount * max(self.get_values(self.get_tiles(next_state)))
+        value = sum([weights.item(tile, action_index) for tile in tiles])
+        step = learning_rate / self.num_tilings * (target - value)
+        for tile in tiles:
+            weights[tile, action_index] = weights.item(tile, action_index) + step
+        return step * self.num_tilings
+
+    def batch_update(self, fields, actions, rewards, next_fields, weights, learning_rate, discount):
+        """One vectorized gradient step over N transitions.
+
+        fields and next_fields are the (ball_x, ball_y, velocity_x, velocity_y,
+        paddle1_y, paddle2_y) arrays of the states, actions indices into ACTIONS
+        and weights importance-sampling weights. Unlike in the table, steps on
+        a shared weight add up. Returns the TD errors.
+        """
+        tiles = self.get_batch_tiles(*fields)
+        next_tiles = self.get_batch_tiles(*next_fields)
+        actions = actions[:, None]
+        values = self.weights[tiles, actions].sum(axis=1)
+        next_values = self.weights[next_tiles].sum(axis=1).max(axis=1)
+        td_errors = rewards + discount * np.where(self.is_final(next_fields[0]), 0.0, next_values) - values
+        steps = learning_rate / self.num_tilings * weights * td_errors
+        np.add.at(self.weights, (tiles, actions), np.repeat(steps[:, None], self.num_tilings, axis=1))
+        return td_errors
+
+    def nbytes(self):
+        return self.weights.nbytes
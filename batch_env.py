@@ -0,0 +1,113 @@
+import numpy as np
+
+# Global variables
+import globals
+
+# Game functions
+from pong import *
+
+from qtable import encode_states
+
+BALL_X, BALL_Y, VELOCITY_X, VELOCITY_Y, PADDLE1_X, PADDLE1_Y, PADDLE2_X, PADDLE2_Y = range(8)
+
+# ACTIONS_EFFECTS in ACTIONS order, so an action index gathers its paddle move
+ACTION_DELTAS = np.array([ACTIONS_EFFECTS[action] for action in ACTIONS], dtype=np.int64)
+
+def step_states(states, agent_actions, adversary_actions):
+    """apply_actions on every row of an (N, 8) state array, in place.
+
+    Actions are indices into ACTIONS. Returns the reward of every row.
+    """
+    board_width, board_height = globals.args.board_width, globals.args.board_height
+    paddle_size = globals.args.paddle_size
+
+    ball_x, ball_y = states[:, BALL_X], states[:, BALL_Y]
+    velocity_x, velocity_y = states[:, VELOCITY_X], states[:, VELOCITY_Y]
+    paddle1_y, paddle2_y = states[:, PADDLE1_Y], states[:, PADDLE2_Y]
+
+    # Apply Opponent and Player actions, unless they would push the paddle off the board
+    for paddle_y, actions in ((paddle1_y, adversary_actions), (paddle2_y, agent_actions)):
+        moved = paddle_y + ACTION_DELTAS[actions]
+        legal = (moved - paddle_size >= 0) & (moved <= board_height - 1)
+        paddle_y[legal] = moved[legal]
+
+    # Move ball
+    ball_x += velocity_x
+    ball_y += velocity_y
+
+    # Bounce off top / bottom wall
+    wall = (ball_y == 0) | (ball_y == board_height - 1)
+    velocity_y[wall] *= -1
+
+    left = ball_x == 0
+    right = ball_x == board_width - 1
+    opponent_miss = left & ((ball_y < paddle1_y - paddle_size) | (ball_y > paddle1_y))
+    player_miss = right & ((ball_y < paddle2_y - paddle_size) | (ball_y > paddle2_y))
+    opponent_hit = left & ~opponent_miss
+    player_hit = right & ~player_miss
+
+    hit = opponent_hit | player_hit
+    velocity_x[hit] *= -1
+    ball_x[hit] += velocity_x[hit]
+
+    rewards = np.full(len(states), MOVE_REWARD)
+    rewards[opponent_miss] = WIN_REWARD
+    rewards[player_miss] = LOSE_REWARD
+    rewards[player_hit] = HIT_REWARD
+    return rewards
+
+class BatchPongEnv(object):
+    """Steps N independent Pong games at once.
+
+    The games live in an (N, 8) int array whose columns follow the state tuple
+    of pong.py. step() mirrors apply_actions for every game, and finished games
+    are reset with get_initial_state in index order, so with the same random
+    seed a game follows exactly the trajectory of the scalar functions.
+    """
+
+    def __init__(self, num_games, max_steps=300):
+        self.num_games = num_games
+        self.max_steps = max_steps
+        self.states = np.zeros((num_games, 8), dtype=np.int64)
+        self.scores = np.zeros(num_games, dtype=np.float64)
+        self.steps = np.zeros(num_games, dtype=np.int64)
+        self.reset()
+
+    def reset(self, games=None):
+        if games is None:
+            games = np.arange(self.num_games)
+        for i in games:
+            self.states[i] = get_initial_state()
+        self.scores[games] = 0
+        self.steps[games] = 0
+        return self.states
+
+    def get_state(self, i):
+        return tuple(int(value) for value in self.states[i])
+
+    def encode(self, states=None):
+        # Q-table row of every game, see qtable.encode_state
+        if states is None:
+            states = self.states
+        return encode_states(states[:, BALL_X], states[:, BALL_Y], states[:, VELOCITY_X], states[:, VELOCITY_Y],
+                             states[:, PADDLE1_Y], states[:, PADDLE2_Y])
+
+    def step(self, agent_actions, adversary_actions):
+        """Apply one tick to every game; actions are indices into ACTIONS.
+
+        Returns (next_states, rewards, dones, scores): the states right after the
+        tick, before finished games are reset, the reward of each game, which
+        games ended and the final score of every game that ended.
+        """
+        rewards = step_states(self.states, agent_actions, adversary_actions)
+
+        self.scores += rewards
+        self.steps += 1
+        # is_final_state plus the max_allowed_steps cap of the training loop
+        ball_x = self.states[:, BALL_X]
+        dones = (ball_x == 0) | (ball_x == globals.args.board_width - 1) | (self.scores < -40) | (self.steps >= self.max_steps)
+        scores = self.scores[dones]
+
+        next_states = self.states.copy()
+        self.reset(np.flatnonzero(dones))
+        return next_states, rewards, dones, scores
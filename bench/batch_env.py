@@ -0,0 +1,105 @@
+# Environment steps per second: scalar apply_actions loop vs BatchPongEnv.
+# --check also steps the same games with the scalar functions under the same
+# seed and compares every step and reset.
+#
+#   python bench/batch_env.py --num_games 1024 --steps 2000
+import os, sys, time, random
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import globals
+
+from pong import *
+from batch_env import BatchPongEnv
+
+def scalar_steps_per_second(steps):
+    state = get_initial_state()
+    score = 0
+    start = time.time()
+    for _ in range(steps):
+        state, reward = apply_actions(state, random.choice(ACTIONS), random.choice(ACTIONS))
+        score += reward
+        if is_final_state(state, score):
+            state = get_initial_state()
+            score = 0
+    return steps / (time.time() - start)
+
+def batch_steps_per_second(num_games, steps, seed):
+    rng = np.random.RandomState(seed)
+    env = BatchPongEnv(num_games)
+    start = time.time()
+    for _ in range(steps):
+        env.step(rng.randint(0, len(ACTIONS), num_games), rng.randint(0, len(ACTIONS), num_games))
+    return num_games * steps / (time.time() - start)
+
+def check(num_games, steps, seed):
+    # both sides draw their resets from random, each from its own copy of the seeded generator
+    rng = np.random.RandomState(seed)
+    random.seed(seed)
+    env = BatchPongEnv(num_games)
+    env_random = random.getstate()
+    random.seed(seed)
+    states = [get_initial_state() for _ in range(num_games)]
+    scalar_random = random.getstate()
+    scores = [0] * num_games
+    game_steps = [0] * num_games
+    for step in range(steps):
+        agent_actions = rng.randint(0, len(ACTIONS), num_games)
+        adversary_actions = rng.randint(0, len(ACTIONS), num_games)
+        random.setstate(env_random)
+        next_states, rewards, dones, done_scores = env.step(agent_actions, adversary_actions)
+        env_random = random.getstate()
+
+        expected_scores = []
+        for i in range(num_games):
+            states[i], reward = apply_actions(states[i], ACTIONS[agent_actions[i]], ACTIONS[adversary_actions[i]])
+            scores[i] += reward
+            game_steps[i] += 1
+            # is_final_state plus the step cap of the training loop, as in BatchPongEnv.step
+            done = bool(is_final_state(states[i], scores[i])) or game_steps[i] >= env.max_steps
+            if tuple(int(value) for value in next_states[i]) != states[i] or rewards[i] != reward or dones[i] != done:
+                raise AssertionError("step %d, game %d: %s %s %s != %s %s %s" % (
+                    step, i, tuple(next_states[i]), rewards[i], dones[i], states[i], reward, done))
+            if done:
+                expected_scores.append(scores[i])
+        if list(done_scores) != expected_scores:
+            raise AssertionError("step %d: final scores %s != %s" % (step, list(done_scores), expected_scores))
+
+        # finished games restart in index order
+        random.setstate(scalar_random)
+        for i in range(num_games):
+            if dones[i]:
+                states[i] = get_initial_state()
+                scores[i] = 0
+                game_steps[i] = 0
+            if env.get_state(i) != states[i]:
+                raise AssertionError("step %d, game %d: reset to %s != %s" % (step, i, env.get_state(i), states[i]))
+        scalar_random = random.getstate()
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--board_width", type = int, default = 41)
+    parser.add_argument("--board_height", type = int, default = 21)
+    parser.add_argument("--paddle_size", type = int, default = 3)
+    parser.add_argument("--num_games", type = int, default = 1024)
+    parser.add_argument("--steps", type = int, default = 2000,
+                        help = "Batched steps; the scalar loop runs num_games times as many capped at 10^6")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--check", action = "store_true",
+                        help = "Check that BatchPongEnv matches apply_actions and get_initial_state step by step")
+    bench_args = parser.parse_args()
+
+    globals.args = Namespace(board_width = bench_args.board_width, board_height = bench_args.board_height,
+                             paddle_size = bench_args.paddle_size)
+    if bench_args.check:
+        check(bench_args.num_games, bench_args.steps, bench_args.seed)
+        print("%d games match over %d steps" % (bench_args.num_games, bench_args.steps))
+    random.seed(bench_args.seed)
+
+    scalar = scalar_steps_per_second(min(bench_args.num_games * bench_args.steps, 10 ** 6))
+    batch = batch_steps_per_second(bench_args.num_games, bench_args.steps, bench_args.seed)
+    print("scalar apply_actions  env steps/s: %12.0f" % scalar)
+    print("BatchPongEnv(%5d)   env steps/s: %12.0f  (x%.1f)" % (bench_args.num_games, batch, batch / scalar))
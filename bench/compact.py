@@ -0,0 +1,80 @@
+# Environment steps per second: tuple apply_actions vs CompactState.step, on the
+# same seeded action sequence. --check also compares the two states every step.
+#
+#   python bench/compact.py --steps 1000000
+import os, sys, time, random
+from argparse import ArgumentParser, Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import globals
+
+from pong import *
+from compact import CompactState
+from qtable import encode_state
+
+def random_actions(steps, seed):
+    rng = random.Random(seed)
+    return [(rng.randrange(len(ACTIONS)), rng.randrange(len(ACTIONS))) for _ in range(steps)]
+
+def tuple_steps_per_second(actions, seed):
+    random.seed(seed)
+    state = get_initial_state()
+    score = 0
+    start = time.time()
+    for agent_action, adversary_action in actions:
+        state, reward = apply_actions(state, ACTIONS[agent_action], ACTIONS[adversary_action])
+        score += reward
+        if is_final_state(state, score):
+            state = get_initial_state()
+            score = 0
+    return len(actions) / (time.time() - start)
+
+def compact_steps_per_second(actions, seed):
+    random.seed(seed)
+    state = CompactState()
+    score = 0
+    start = time.time()
+    for agent_action, adversary_action in actions:
+        score += state.step(agent_action, adversary_action)
+        if state.is_final(score):
+            state.reset()
+            score = 0
+    return len(actions) / (time.time() - start)
+
+def check(actions, seed):
+    random.seed(seed)
+    state = get_initial_state()
+    compact_state = CompactState(state)
+    score = 0
+    for step, (agent_action, adversary_action) in enumerate(actions):
+        state, reward = apply_actions(state, ACTIONS[agent_action], ACTIONS[adversary_action])
+        if compact_state.step(agent_action, adversary_action) != reward or compact_state.to_tuple() != state \
+                or compact_state.index() != encode_state(state):
+            raise AssertionError("step %d: %s != %s" % (step, compact_state.to_tuple(), state))
+        score += reward
+        if is_final_state(state, score):
+            state = get_initial_state()
+            compact_state.load(state)
+            score = 0
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--board_width", type = int, default = 41)
+    parser.add_argument("--board_height", type = int, default = 21)
+    parser.add_argument("--paddle_size", type = int, default = 3)
+    parser.add_argument("--steps", type = int, default = 1000000)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--check", action = "store_true",
+                        help = "Check that both engines go through the same states")
+    bench_args = parser.parse_args()
+
+    globals.args = Namespace(board_width = bench_args.board_width, board_height = bench_args.board_height,
+                             paddle_size = bench_args.paddle_size)
+    actions = random_actions(bench_args.steps, bench_args.seed)
+
+    if bench_args.check:
+        check(actions, bench_args.seed)
+        print("states match over %d steps" % len(actions))
+    print("tuple    steps/s: %10.0f" % tuple_steps_per_second(actions, bench_args.seed))
+    print("compact  steps/s: %10.0f" % compact_steps_per_second(actions, bench_args.seed))
@@ -0,0 +1,67 @@
+# Load generator for policy_server.py: reports p50/p99 latency and requests per second.
+#
+#   python bench/policy_load.py --unix /tmp/pong.sock --clients 16 --requests 20000
+import os, sys, time
+import multiprocessing as mp
+from argparse import ArgumentParser
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from policy_server import PolicyClient, parse_address
+
+def random_states(rng, count, board_width, board_height, paddle_size):
+    states = np.zeros((count, 8), dtype=np.int64)
+    states[:, 0] = rng.randint(0, board_width, count)
+    states[:, 1] = rng.randint(0, board_height, count)
+    states[:, 2] = rng.choice([-1, 1], count)
+    states[:, 3] = rng.choice([-1, 1], count)
+    states[:, 5] = rng.randint(paddle_size, board_height, count)
+    states[:, 6] = board_width - 1
+    states[:, 7] = rng.randint(paddle_size, board_height, count)
+    return [tuple(int(value) for value in state) for state in states]
+
+def run_client(load_args, client_id, results):
+    rng = np.random.RandomState(load_args.seed + client_id)
+    states = random_states(rng, load_args.requests * load_args.pipeline,
+                           load_args.board_width, load_args.board_height, load_args.paddle_size)
+    client = PolicyClient(*parse_address(load_args.unix, load_args.tcp))
+    latencies = np.zeros(load_args.requests)
+    for i in range(load_args.requests):
+        start = time.time()
+        client.act_indices(states[i * load_args.pipeline:(i + 1) * load_args.pipeline])
+        latencies[i] = time.time() - start
+    client.close()
+    results.put(latencies)
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--unix", type = str, default = None)
+    parser.add_argument("--tcp", type = str, default = "127.0.0.1:7777")
+    parser.add_argument("--board_width", type = int, default = 41)
+    parser.add_argument("--board_height", type = int, default = 21)
+    parser.add_argument("--paddle_size", type = int, default = 3)
+    parser.add_argument("--clients", type = int, default = 8,
+                        help = "Concurrent client processes")
+    parser.add_argument("--requests", type = int, default = 10000,
+                        help = "Requests sent by each client, one at a time")
+    parser.add_argument("--pipeline", type = int, default = 1,
+                        help = "States per request")
+    parser.add_argument("--seed", type = int, default = 0)
+    load_args = parser.parse_args()
+
+    results = mp.Queue()
+    clients = [mp.Process(target=run_client, args=(load_args, client_id, results))
+               for client_id in range(load_args.clients)]
+    start = time.time()
+    for client in clients:
+        client.start()
+    latencies = np.concatenate([results.get() for _ in clients])
+    elapsed = time.time() - start
+    for client in clients:
+        client.join()
+
+    print("requests: %d  states/request: %d  clients: %d" % (len(latencies), load_args.pipeline, load_args.clients))
+    print("p50: %.1f us  p99: %.1f us" % (np.percentile(latencies, 50) * 1e6, np.percentile(latencies, 99) * 1e6))
+    print("requests/s: %.0f  states/s: %.0f" % (len(latencies) / elapsed, len(latencies) * load_args.pipeline / elapsed))
@@ -0,0 +1,80 @@
+# Compares the dict, dense array and tile-coded Q stores: memory use and updates per second.
+#
+#   python bench/q_store.py --steps 200000
+import os, sys, time, random
+from argparse import ArgumentParser, Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import globals
+
+from pong import *
+from qtable import QTable, make_q_table
+from approx import TileCodingQ
+
+def dict_nbytes(Q):
+    # the dict itself, every (state, action) key tuple, every state tuple and every float
+    size = sys.getsizeof(Q)
+    states = set()
+    for key, value in Q.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+        states.add(key[0])
+    for state in states:
+        size += sys.getsizeof(state)
+    return size
+
+def record_transitions(steps, seed):
+    random.seed(seed)
+    transitions = []
+    state = get_initial_state()
+    score = 0
+    while len(transitions) < steps:
+        agent_action = random.choice(ACTIONS)
+        adversary_action = random.choice(ACTIONS)
+        next_state, reward = apply_actions(state, agent_action, adversary_action)
+        transitions.append((state, agent_action, reward, next_state))
+        score += reward
+        state = next_state
+        if is_final_state(state, score):
+            state = get_initial_state()
+            score = 0
+    return transitions
+
+def run_updates(Q, transitions):
+    from main import update_q
+    start = time.time()
+    for state, action, reward, next_state in transitions:
+        if (state, action) not in Q:
+            Q[(state, action)] = 0.0
+        update_q(Q, state, action, reward, next_state, ACTIONS)
+    return time.time() - start
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--board_width", type = int, default = 41)
+    parser.add_argument("--board_height", type = int, default = 21)
+    parser.add_argument("--paddle_size", type = int, default = 3)
+    parser.add_argument("--steps", type = int, default = 200000,
+                        help = "Number of Q updates per store")
+    parser.add_argument("--seed", type = int, default = 0)
+    bench_args = parser.parse_args()
+
+    globals.args = Namespace(board_width = bench_args.board_width, board_height = bench_args.board_height,
+                             paddle_size = bench_args.paddle_size, learning_rate = 0.2, discount = 0.9,
+                             num_tilings = 8, num_tiles = 8)
+
+    transitions = record_transitions(bench_args.steps, bench_args.seed)
+
+    for q_store in ["dict", "array", "tiles"]:
+        try:
+            Q = make_q_table(q_store)
+        except MemoryError:
+            print("%-5s  does not fit in memory on this board" % q_store)
+            continue
+        elapsed = run_updates(Q, transitions)
+        if isinstance(Q, (QTable, TileCodingQ)):
+            nbytes, entries = Q.nbytes(), len(Q)
+        else:
+            nbytes, entries = dict_nbytes(Q), len(Q)
+        print("%-5s  entries: %9d  memory: %8.2f MB  updates/s: %10.0f" % (
+            q_store, entries, nbytes / 1e6, len(transitions) / elapsed))
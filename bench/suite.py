@@ -0,0 +1,205 @@
+# Reproducible throughput benchmarks for the environment, the learner and the renderers.
+#
+#   python bench/suite.py --out bench.json
+#   python bench/suite.py --out new.json --compare bench.json
+#
+# Every case does a fixed amount of seeded work and reports its best rate over
+# --repeat runs. With --compare, cases that got slower than the previous results
+# by more than --tolerance are listed and the exit status is 1.
+import os, sys, json, time, random, platform, itertools
+from argparse import ArgumentParser
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# the pygame renderer is measured without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+# Global variables
+import globals
+
+from pong import *
+from main import parse_args, best_action, q_learning
+from qtable import QTable
+
+STRATEGIES = ["random", "greedy", "epsilon_greedy"]
+ADVERSARY_STRATEGIES = ["random", "greedy", "almost_perfect"]
+
+class quiet(object):
+    # swallows the per-episode prints of q_learning
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+    def __exit__(self, *exc_info):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+def best_rate(run, work, repeat):
+    # run() does `work` units; returns the best units per second
+    best = 0.0
+    for _ in range(repeat):
+        start = time.time()
+        run()
+        best = max(best, work / (time.time() - start))
+    return best
+
+def random_states(rng, count):
+    states = []
+    for _ in range(count):
+        states.append((rng.randrange(globals.args.board_width), rng.randrange(globals.args.board_height),
+                       rng.choice([-1, 1]), rng.choice([-1, 1]),
+                       0, rng.randrange(globals.args.paddle_size, globals.args.board_height),
+                       globals.args.board_width - 1, rng.randrange(globals.args.paddle_size, globals.args.board_height)))
+    return states
+
+def bench_apply_actions(steps, repeat):
+    def run():
+        random.seed(0)
+        state = get_initial_state()
+        score = 0
+        for _ in range(steps):
+            state, reward = apply_actions(state, choice(ACTIONS), choice(ACTIONS))
+            score += reward
+            if is_final_state(state, score):
+                state = get_initial_state()
+                score = 0
+    return best_rate(run, steps, repeat)
+
+def bench_episodes(episodes, repeat):
+    def run():
+        random.seed(0)
+        for _ in range(episodes):
+            state = get_initial_state()
+            score = 0
+            while not is_final_state(state, score):
+                state, reward = apply_actions(state, choice(ACTIONS), choice(ACTIONS))
+                score += reward
+    return best_rate(run, episodes, repeat)
+
+def make_dict_q(entries):
+    # a dict store of `entries` (state, action) keys; the fields range past the
+    # board so that any size fits, which does not matter to the dict probes
+    rng = random.Random(0)
+    Q = {}
+    while len(Q) < entries:
+        state = (rng.randrange(1000), rng.randrange(1000), rng.choice([-1, 1]), rng.choice([-1, 1]),
+                 0, rng.randrange(1000), globals.args.board_width - 1, rng.randrange(1000))
+        for action in ACTIONS:
+            Q[(state, action)] = rng.random()
+    return Q
+
+def bench_best_action(Q, lookups, repeat):
+    if isinstance(Q, dict):
+        # states known to the table, probed in a shuffled order
+        states = [state for state, action in itertools.islice(Q, lookups * len(ACTIONS)) if action == ACTIONS[0]]
+        random.Random(1).shuffle(states)
+    else:
+        states = random_states(random.Random(1), lookups)
+    def run():
+        for state in states:
+            best_action(Q, state, ACTIONS)
+    return best_rate(run, len(states), repeat)
+
+def bench_q_learning(agent_strategy, adversary_strategy, episodes, repeat):
+    def run():
+        globals.args = parse_args(["--agent_strategy", agent_strategy, "--adversary_strategy", adversary_strategy,
+                                   "--train_episodes", str(episodes), "--seed", "0"])
+        with quiet():
+            q_learning()
+    return best_rate(run, episodes, repeat)
+
+def bench_render(draw, frames, repeat):
+    def run():
+        random.seed(0)
+        state = get_initial_state()
+        score = 0
+        for frame in range(frames):
+            draw({}, state, 0, 0, frame, 0)
+            state, reward = apply_actions(state, choice(ACTIONS), choice(ACTIONS))
+            score += reward
+            if is_final_state(state, score):
+                state = get_initial_state()
+                score = 0
+    with quiet():
+        return best_rate(run, frames, repeat)
+
+def run_suite(bench_args):
+    results = {}
+    globals.args = parse_args([])
+
+    results["apply_actions_per_sec"] = bench_apply_actions(bench_args.steps, bench_args.repeat)
+    results["episodes_per_sec"] = bench_episodes(bench_args.episodes, bench_args.repeat)
+
+    for entries in bench_args.q_sizes:
+        Q = make_dict_q(entries)
+        results["best_action_dict_%d_per_sec" % entries] = bench_best_action(Q, bench_args.lookups, bench_args.repeat)
+        del Q
+    results["best_action_array_per_sec"] = bench_best_action(QTable(), bench_args.lookups, bench_args.repeat)
+
+    for agent_strategy in STRATEGIES:
+        for adversary_strategy in ADVERSARY_STRATEGIES:
+            key = "q_learning_%s_vs_%s_episodes_per_sec" % (agent_strategy, adversary_strategy)
+            results[key] = bench_q_learning(agent_strategy, adversary_strategy, bench_args.train_episodes, bench_args.repeat)
+    globals.args = parse_args([])
+
+    results["print_board_frames_per_sec"] = bench_render(print_board, bench_args.frames, bench_args.repeat)
+    results["display_state_frames_per_sec"] = bench_render(display_state, bench_args.frames, bench_args.repeat)
+    return results
+
+def compare(results, previous, tolerance):
+    # all results are rates, so lower is worse
+    regressions = []
+    for key in sorted(results):
+        if key not in previous:
+            continue
+        ratio = results[key] / previous[key]
+        print("%-55s %14.1f %14.1f  x%.2f" % (key, previous[key], results[key], ratio))
+        if ratio < 1.0 - tolerance:
+            regressions.append(key)
+    return regressions
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--out", type = str, default = "bench.json",
+                        help = "Write the results to this JSON file")
+    parser.add_argument("--compare", type = str, default = None,
+                        help = "Previous results to compare against")
+    parser.add_argument("--tolerance", type = float, default = 0.1,
+                        help = "Slowdown fraction reported as a regression")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--steps", type = int, default = 200000,
+                        help = "apply_actions calls per run")
+    parser.add_argument("--episodes", type = int, default = 2000,
+                        help = "Random-play episodes per run")
+    parser.add_argument("--q_sizes", type = int, nargs = "+", default = [10 ** 4, 10 ** 6, 10 ** 7],
+                        help = "Entries of the dict Q-tables probed by best_action")
+    parser.add_argument("--lookups", type = int, default = 100000,
+                        help = "best_action calls per run")
+    parser.add_argument("--train_episodes", type = int, default = 200,
+                        help = "Episodes of each q_learning run")
+    parser.add_argument("--frames", type = int, default = 500,
+                        help = "Frames drawn per renderer run")
+    bench_args = parser.parse_args()
+
+    results = run_suite(bench_args)
+    output = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(bench_args.out, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+
+    if bench_args.compare is not None:
+        with open(bench_args.compare) as f:
+            previous = json.load(f)["results"]
+        regressions = compare(results, previous, bench_args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+    else:
+        for key in sorted(results):
+            print("%-55s %14.1f" % (key, results[key]))
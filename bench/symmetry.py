@@ -0,0 +1,73 @@
+# Compares training with and without --symmetric: Q-table size and the number
+# of episodes until the evaluation score reaches a target.
+#
+#   python bench/symmetry.py --train_episodes 5000 --target 0
+import os, sys, time, random
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Global variables
+import globals
+
+from main import parse_args, serial_q_learning
+from qtable import QTable
+from policies import reset_adversaries
+from q_store import dict_nbytes
+
+def episodes_to_target(eval_scores, eval_every, window, target):
+    # first episode at which the mean of the last `window` evaluations reaches target
+    for i in range(window - 1, len(eval_scores)):
+        if sum(eval_scores[i - window + 1:i + 1]) / float(window) >= target:
+            return i * eval_every
+    return None
+
+def run(q_store, symmetric, bench_args):
+    argv = ["--q_store", q_store, "--agent_strategy", "epsilon_greedy",
+            "--adversary_strategy", bench_args.adversary_strategy,
+            "--train_episodes", str(bench_args.train_episodes), "--eval_every", str(bench_args.eval_every),
+            "--eval_episodes", str(bench_args.eval_episodes), "--seed", str(bench_args.seed)]
+    if symmetric:
+        argv.append("--symmetric")
+    globals.args = parse_args(argv)
+    # what q_learning does before serial training, so runs with the same --seed are the same
+    random.seed(globals.args.seed)
+    reset_adversaries()
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        start = time.time()
+        Q, train_scores, eval_scores, games_won, games_lost = serial_q_learning()
+        elapsed = time.time() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    if isinstance(Q, QTable):
+        entries, nbytes = len(Q), Q.nbytes()
+    else:
+        entries, nbytes = len(Q), dict_nbytes(Q)
+    converged = episodes_to_target(eval_scores, bench_args.eval_every, bench_args.window, bench_args.target)
+    print("%-5s  symmetric: %-5s  entries: %9d  memory: %8.2f MB  episodes to target: %6s  time: %7.1f s" % (
+        q_store, symmetric, entries, nbytes / 1e6, "-" if converged is None else converged, elapsed))
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--q_store", type = str, nargs = "+", default = ["dict", "array"])
+    parser.add_argument("--adversary_strategy", type = str, default = "random",
+                        choices = ["random", "greedy"],
+                        help = "Adversaries that play mirror images alike, see qtable.SymmetricDict")
+    parser.add_argument("--train_episodes", type = int, default = 5000)
+    parser.add_argument("--eval_every", type = int, default = 100)
+    parser.add_argument("--eval_episodes", type = int, default = 50)
+    parser.add_argument("--window", type = int, default = 5,
+                        help = "Evaluations averaged when testing for the target")
+    parser.add_argument("--target", type = float, default = 0.0,
+                        help = "Mean evaluation score counted as converged")
+    parser.add_argument("--seed", type = int, default = 0)
+    bench_args = parser.parse_args()
+
+    for q_store in bench_args.q_store:
+        for symmetric in (False, True):
+            run(q_store, symmetric, bench_args)
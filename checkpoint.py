@@ -0,0 +1,80 @@
+import os, struct
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+from qtable import QTable, SymmetricDict, get_num_rows
+
+# Layout: a fixed-size little-endian header, zero padded to HEADER_SIZE so the
+# values start page aligned, then num_states * num_actions float32 values row
+# by row, exactly the QTable.values array. num_states counts the rows, half the
+# states of the board for a symmetric table. learning_rate and epsilon are the
+# configured values, before any decay schedule.
+MAGIC = b"PONGQTBL"
+VERSION = 2
+HEADER_FORMAT = "<8sIIIIIIQdddQ"
+HEADER_FIELDS = ("magic", "version", "board_width", "board_height", "paddle_size", "num_actions", "symmetric",
+                 "num_states", "learning_rate", "discount", "epsilon", "episodes")
+HEADER_SIZE = 4096
+
+def make_header(episodes, symmetric=False):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION,
+                         globals.args.board_width, globals.args.board_height, globals.args.paddle_size,
+                         len(ACTIONS), int(symmetric), get_num_rows(symmetric),
+                         globals.args.learning_rate_start, globals.args.discount, globals.args.epsilon_start,
+                         episodes)
+    return header + b"\0" * (HEADER_SIZE - len(header))
+
+def load_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(struct.calcsize(HEADER_FORMAT))
+    if len(raw) < struct.calcsize(HEADER_FORMAT) or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError("%s is not a Q-table checkpoint" % path)
+    header = dict(zip(HEADER_FIELDS, struct.unpack(HEADER_FORMAT, raw)))
+    if header["version"] != VERSION:
+        raise ValueError("%s has checkpoint version %d, expected %d" % (path, header["version"], VERSION))
+    return header
+
+def read_header(path):
+    # load_header, checked against the board in globals.args
+    header = load_header(path)
+    for field in ("board_width", "board_height", "paddle_size"):
+        if header[field] != getattr(globals.args, field):
+            raise ValueError("%s was trained with %s %d, current board has %d" % (
+                path, field, header[field], getattr(globals.args, field)))
+    return header
+
+def to_q_table(Q):
+    if isinstance(Q, QTable):
+        return Q
+    # the keys of a SymmetricDict are already canonical
+    table = QTable(symmetric=isinstance(Q, SymmetricDict))
+    for (state, action), value in Q.items():
+        table[(state, action)] = value
+    return table
+
+def save_q_table(path, Q, episodes):
+    """Write Q (either store) to path; the file is swapped in atomically."""
+    table = to_q_table(Q)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(make_header(episodes, table.symmetric))
+        table.values.astype(np.float32).tofile(f)
+    os.rename(tmp_path, path)
+
+def load_q_table(path, mode="r"):
+    """Map a checkpoint into memory without reading it.
+
+    mode is the numpy.memmap mode: "r" shares the pages read-only between
+    processes through the page cache, "c" gives a private copy-on-write table
+    to keep training on. Training never writes into a checkpoint file, so the
+    file only changes when save_q_table swaps in a consistent table.
+    Returns the QTable and the number of episodes it was trained for.
+    """
+    header = read_header(path)
+    values = np.memmap(path, dtype=np.float32, mode=mode, offset=HEADER_SIZE,
+                       shape=(header["num_states"], header["num_actions"]))
+    return QTable(values, bool(header["symmetric"])), header["episodes"]
@@ -0,0 +1,96 @@
+from random import choice
+
+# Global variables
+import globals
+
+from pong import ACTIONS, ACTIONS_EFFECTS, MOVE_REWARD, HIT_REWARD, WIN_REWARD, LOSE_REWARD
+from qtable import get_state_strides
+
+# what CompactState.step takes: indices into ACTIONS
+ACTION_INDICES = list(range(len(ACTIONS)))
+
+def get_paddle_moves():
+    # moves[action index][paddle_y] -> paddle_y after the action, clamped to the board like apply_actions
+    moves = []
+    for action in ACTIONS:
+        effect = ACTIONS_EFFECTS[action]
+        moves.append([y + effect if y + effect - globals.args.paddle_size >= 0 and y + effect <= globals.args.board_height - 1
+                      else y for y in range(globals.args.board_height)])
+    return moves
+
+class CompactState(object):
+    """A game state held as plain ints and stepped in place.
+
+    An alternative to the 8-tuples of pong.py for loops that step many
+    times: step() follows apply_actions exactly but takes action indices,
+    updates the fields in place and moves the paddles through precomputed
+    clamp tables, so no tuple is built per tick. index() is the state's row
+    in a (non-symmetric) QTable, equal to encode_state(to_tuple()).
+    """
+
+    __slots__ = ("ball_x", "ball_y", "velocity_x", "velocity_y", "paddle1_y", "paddle2_y",
+                 "width", "height", "paddle_size", "moves", "strides", "offset")
+
+    def __init__(self, state=None):
+        self.width = globals.args.board_width
+        self.height = globals.args.board_height
+        self.paddle_size = globals.args.paddle_size
+        self.moves = get_paddle_moves()
+        self.strides = get_state_strides()
+        self.offset = self.paddle_size * (self.strides[4] + self.strides[5])
+        if state is None:
+            self.reset()
+        else:
+            self.load(state)
+
+    def reset(self):
+        # same state, and same draws from random, as get_initial_state
+        self.ball_x, self.ball_y = self.width // 2, self.height // 2
+        self.velocity_x, self.velocity_y = choice([-1, 1]), choice([-1, 1])
+        self.paddle1_y = self.paddle2_y = self.height // 2
+
+    def load(self, state):
+        self.ball_x, self.ball_y, self.velocity_x, self.velocity_y = state[0], state[1], state[2], state[3]
+        self.paddle1_y, self.paddle2_y = state[5], state[7]
+
+    def to_tuple(self):
+        return (self.ball_x, self.ball_y, self.velocity_x, self.velocity_y,
+                0, self.paddle1_y, self.width - 1, self.paddle2_y)
+
+    def index(self):
+        strides = self.strides
+        return (self.ball_x * strides[0] + self.ball_y * strides[1] + (self.velocity_x > 0) * strides[2] +
+                (self.velocity_y > 0) * strides[3] + self.paddle1_y * strides[4] + self.paddle2_y * strides[5] -
+                self.offset)
+
+    def is_final(self, score):
+        return self.ball_x == 0 or self.ball_x == self.width - 1 or score < -40
+
+    def step(self, agent_action, adversary_action):
+        """apply_actions in place, with indices into ACTIONS; returns the reward."""
+        paddle1_y = self.paddle1_y = self.moves[adversary_action][self.paddle1_y]
+        paddle2_y = self.paddle2_y = self.moves[agent_action][self.paddle2_y]
+
+        ball_x = self.ball_x + self.velocity_x
+        ball_y = self.ball_y = self.ball_y + self.velocity_y
+
+        # Bounce off top / bottom wall
+        if ball_y == 0 or ball_y == self.height - 1:
+            self.velocity_y = -self.velocity_y
+
+        reward = MOVE_REWARD
+        if ball_x == 0:
+            if ball_y < paddle1_y - self.paddle_size or ball_y > paddle1_y:
+                reward = WIN_REWARD
+            else:
+                self.velocity_x = -self.velocity_x
+                ball_x += self.velocity_x
+        elif ball_x == self.width - 1:
+            if ball_y < paddle2_y - self.paddle_size or ball_y > paddle2_y:
+                reward = LOSE_REWARD
+            else:
+                self.velocity_x = -self.velocity_x
+                ball_x += self.velocity_x
+                reward = HIT_REWARD
+        self.ball_x = ball_x
+        return reward
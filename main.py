@@ -1,6 +1,6 @@
 # General imports
 from copy import copy
-from random import choice, random
+from random import choice, random, seed
 from argparse import ArgumentParser
 
 # Global variables
@@ -9,6 +9,20 @@ import globals
 # Game functions
 from pong import *
 
+# Q-table stores
+from qtable import QTable, SymmetricDict, make_q_table, encode_state
+from approx import TileCodingQ
+from compact import CompactState, ACTION_INDICES
+from replay import replay
+from profiler import NullProfiler, make_profiler
+from stats import make_stats_sink
+
+# Adversary strategies
+from policies import get_adversary, reset_adversaries
+
+# Hyperparameter schedules and convergence
+from schedules import make_schedules, apply_schedules, make_early_stop
+
 def epsilon_greedy(Q, state, legal_actions, epsilon):
     if random() < epsilon:
         action = choice(legal_actions)
@@ -19,6 +33,8 @@ def epsilon_greedy(Q, state, legal_actions, epsilon):
         return best_action(Q, state, legal_actions)
 
 def best_action(Q, state, legal_actions):
+    if isinstance(Q, (QTable, SymmetricDict, TileCodingQ)):
+        return Q.best_action(state, legal_actions)
     best_action = None
     max_value = -99999
     for action in legal_actions:
@@ -29,135 +45,320 @@ def best_action(Q, state, legal_actions):
             best_action = action
     return best_action
 
-def q_learning():
-    Q = {}
-    train_scores = []
-    eval_scores = []
-    games_won = 0
-    games_lost = 0
-    
-    # for each episode ...
-    for train_ep in range(0, globals.args.train_episodes):
-    
-        print("Episode %6d / %6d" % (train_ep, globals.args.train_episodes))
+def update_q(Q, state, action, reward, next_state, legal_actions):
+    # returns the change of Q(state, action)
+    if isinstance(Q, (QTable, TileCodingQ)):
+        return Q.update(state, action, reward, next_state, globals.args.learning_rate, globals.args.discount)
+    max_a = best_action(Q, next_state, legal_actions)
+    delta = globals.args.learning_rate * (reward + globals.args.discount * Q[(next_state, max_a)] - Q[(state, action)])
+    Q[(state, action)] = Q[(state, action)] + delta
+    return delta
+
+def train_episode(Q, games_won, games_lost, replay_buffer=None, profiler=NullProfiler(), early_stop=None, planner=None):
+    if globals.args.engine == "compact":
+        return train_episode_compact(Q, games_won, games_lost, profiler, early_stop, planner)
+
+    # ... get the initial state,
+    score = 0
+    agent_score = 0
+    adversary_score = 0
+    max_allowed_steps = 300
+    state = get_initial_state()
+    adversary = get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh)
+    profiler.lap("other")
+        
+    # while current state is not terminal
+    while not is_final_state(state, score) and max_allowed_steps > 0:
     
-        # ... get the initial state,
-        score = 0
-        agent_score = 0
-        adversary_score = 0
-        max_allowed_steps = 300
-        state = get_initial_state()
+        # display current state and sleep
+        if globals.args.verbose:
+            if globals.args.term:
+                print_board(Q, state, agent_score, adversary_score, games_won, games_lost)
+            else:
+                display_state(Q, state, agent_score, adversary_score, games_won, games_lost)
+            time.sleep(globals.args.sleep)
+            profiler.lap("render")
+
+        # choose one of the legal actions
+        actions = get_legal_actions(state)
+        
+        if globals.args.agent_strategy == "random":
+            agent_action = choice(actions)
+        elif globals.args.agent_strategy == "greedy":
+            agent_action = best_action(Q, state, actions)
+        elif globals.args.agent_strategy == "epsilon_greedy":
+            agent_action = epsilon_greedy(Q, state, actions, globals.args.epsilon)
+
+        adversary_action = adversary.act(Q, state, actions)
+        profiler.lap("select")
+        
+        # apply action and get the next state and the reward
+        next_state, reward = apply_actions(state, agent_action, adversary_action)
+        score += reward
+        profiler.lap("step")
+        
+        if reward == WIN_REWARD:
+            games_won += 1
+            agent_score += 1
+        
+        if reward == LOSE_REWARD:
+            games_lost += 1
+            adversary_score += 1
             
-        # while current state is not terminal
-        while not is_final_state(state, score) and max_allowed_steps > 0:
+        if globals.args.agent_strategy == "greedy" or globals.args.agent_strategy == "epsilon_greedy":
+            delta = update_q(Q, state, agent_action, reward, next_state, actions)
+            if early_stop is not None:
+                early_stop.record_delta(delta)
+            profiler.lap("update")
+
+            # back up the states the model says this update affects
+            if planner is not None:
+                change = planner.step(Q, encode_state(state))
+                if early_stop is not None:
+                    early_stop.record_delta(change)
+                profiler.lap("plan")
+
+            # learn again from past transitions
+            if replay_buffer is not None:
+                replay_buffer.add(state, agent_action, reward, next_state, bool(is_final_state(next_state, score)))
+                if len(replay_buffer) >= globals.args.replay_batch and max_allowed_steps % globals.args.replay_every == 0:
+                    td_errors = replay(Q, replay_buffer, globals.args.replay_batch)
+                    if early_stop is not None:
+                        early_stop.record_delta(globals.args.learning_rate * abs(td_errors).max())
+                profiler.lap("replay")
+
+        # update current state
+        state = next_state
         
-            # display current state and sleep
-            if globals.args.verbose:
-                if globals.args.term:
-                    print_board(state)
-                else:
-                    display_state(Q, state, agent_score, adversary_score, games_won, games_lost)
-                time.sleep(globals.args.sleep)
+        max_allowed_steps -= 1
+
+    adversary.episode_done(Q)
+    return score, games_won, games_lost
+
+def train_episode_compact(Q, games_won, games_lost, profiler=NullProfiler(), early_stop=None, planner=None):
+    # train_episode stepping a CompactState and indexing the array store by row,
+    # with the same draws from random, so a seeded run trains the same table
+    if not isinstance(Q, QTable) or Q.symmetric:
+        raise ValueError("the compact engine needs a QTable that is not symmetric, it indexes rows by CompactState.index()")
+    score = 0
+    max_allowed_steps = 300
+    state = CompactState()
+    adversary = get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh)
+    learning = globals.args.agent_strategy == "greedy" or globals.args.agent_strategy == "epsilon_greedy"
+    profiler.lap("other")
+
+    while not state.is_final(score) and max_allowed_steps > 0:
+        row = state.index()
+
+        if globals.args.agent_strategy == "random":
+            agent_action = choice(ACTION_INDICES)
+        elif globals.args.agent_strategy == "greedy":
+            agent_action = Q.best_row_action(row)
+        elif globals.args.agent_strategy == "epsilon_greedy":
+            if random() < globals.args.epsilon:
+                agent_action = choice(ACTION_INDICES)
+            else:
+                agent_action = Q.best_row_action(row)
+
+        adversary_action = adversary.act_compact(Q, state)
+        profiler.lap("select")
+
+        reward = state.step(agent_action, adversary_action)
+        score += reward
+        profiler.lap("step")
+
+        if reward == WIN_REWARD:
+            games_won += 1
+        if reward == LOSE_REWARD:
+            games_lost += 1
 
+        if learning:
+            delta = Q.update_row(row, agent_action, reward, state.index(), globals.args.learning_rate, globals.args.discount)
+            if early_stop is not None:
+                early_stop.record_delta(delta)
+            profiler.lap("update")
+
+            if planner is not None:
+                change = planner.step(Q, row)
+                if early_stop is not None:
+                    early_stop.record_delta(change)
+                profiler.lap("plan")
+
+        max_allowed_steps -= 1
+
+    adversary.episode_done(Q)
+    return score, games_won, games_lost
+
+def evaluate_policy(Q):
+    if globals.args.engine == "compact":
+        return evaluate_policy_compact(Q)
+    avg_score = .0
+    scores = []
+    adversary = get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh)
+    for eval_ep in range(0, globals.args.eval_episodes):
+        state = get_initial_state()
+        score = 0
+        max_allowed_steps = 300
+        while not is_final_state(state, score) and max_allowed_steps > 0:
             # choose one of the legal actions
-            actions = get_legal_actions(state)
+            actions = get_legal_actions(state)                
             
             if globals.args.agent_strategy == "random":
                 agent_action = choice(actions)
-            elif globals.args.agent_strategy == "greedy":
+            else:
                 agent_action = best_action(Q, state, actions)
-            elif globals.args.agent_strategy == "epsilon_greedy":
-                agent_action = epsilon_greedy(Q, state, actions, globals.args.epsilon)
-
-            if globals.args.adversary_strategy == "random":
-                adversary_action = choice(actions)
-            elif globals.args.adversary_strategy == "greedy":          
-                mirrored_state = get_mirrored_state(state)
-                adversary_action = best_action(Q, mirrored_state, get_legal_actions(mirrored_state))
-            elif globals.args.adversary_strategy == "almost_perfect":
-                if random() < 0.3:
-                    adversary_action = choice(actions)
-                else:
-                    ball_x, ball_y = state[0], state[1]
-                    velocity_x, velocity_y = state[2], state[3]
-                    paddle1_x, paddle1_y = state[4], state[5]
-                    if ball_y + velocity_y > paddle1_y:
-                        adversary_action = "DOWN"
-                    elif ball_y + velocity_y < paddle1_y:
-                        adversary_action = "UP"
-                    else:
-                        adversary_action = "STAY"
-            
-            # apply action and get the next state and the reward
-            next_state, reward = apply_actions(state, agent_action, adversary_action)
+                
+            adversary_action = adversary.act(Q, state, actions)
+            state, reward = apply_actions(state, agent_action, adversary_action)
             score += reward
             
-            if reward == WIN_REWARD:
-                games_won += 1
-                agent_score += 1
-            
-            if reward == LOSE_REWARD:
-                games_lost += 1
-                adversary_score += 1
-                
-            if globals.args.agent_strategy == "greedy" or globals.args.agent_strategy == "epsilon_greedy":
-                max_a = best_action(Q, next_state, actions)
-                Q[(state, agent_action)] = Q[(state, agent_action)] + globals.args.learning_rate * (reward + globals.args.discount * Q[(next_state, max_a)] - Q[(state, agent_action)])
+            max_allowed_steps -= 1
+        
+        scores.append(score)
+    avg_score = sum(scores)/float(len(scores))
+    return avg_score
 
-            # update current state
-            state = next_state
-            
+def evaluate_policy_compact(Q):
+    # evaluate_policy on a CompactState, see train_episode_compact
+    if not isinstance(Q, QTable) or Q.symmetric:
+        raise ValueError("the compact engine needs a QTable that is not symmetric, it indexes rows by CompactState.index()")
+    scores = []
+    adversary = get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh)
+    for eval_ep in range(0, globals.args.eval_episodes):
+        state = CompactState()
+        score = 0
+        max_allowed_steps = 300
+        while not state.is_final(score) and max_allowed_steps > 0:
+            if globals.args.agent_strategy == "random":
+                agent_action = choice(ACTION_INDICES)
+            else:
+                agent_action = Q.best_row_action(state.index())
+            score += state.step(agent_action, adversary.act_compact(Q, state))
             max_allowed_steps -= 1
+        scores.append(score)
+    return sum(scores) / float(len(scores))
+
+def init_q_table():
+    # returns the table and the number of episodes it was already trained for
+    if globals.args.load_q is not None:
+        from checkpoint import load_q_table
+        return load_q_table(globals.args.load_q, mode="c")
+    return make_q_table(globals.args.q_store, globals.args.symmetric), 0
+
+def serial_q_learning(on_eval=None):
+    # on_eval(train_ep, eval_scores) is called after every evaluation with the
+    # scores known so far; training stops early when it returns True
+    Q, first_ep = init_q_table()
+    eval_scores = []
+    games_won = 0
+    games_lost = 0
+
+    replay_buffer = None
+    if globals.args.replay_size > 0:
+        from replay import ReplayBuffer
+        replay_buffer = ReplayBuffer(globals.args.replay_size, globals.args.replay_dir,
+                                     prioritized=globals.args.replay_prioritized)
 
-        train_scores.append(score)
+    profiler = make_profiler(globals.args.profile, globals.args.profile_every)
+    stats = make_stats_sink(globals.args.stats_log, globals.args.stats_every)
+
+    eval_pool = None
+    if globals.args.eval_workers > 0:
+        from parallel import EvalPool
+        eval_pool = EvalPool(evaluate_policy, globals.args.eval_workers)
+
+    schedules = make_schedules()
+    early_stop = make_early_stop()
+
+    planner = None
+    if globals.args.planning is not None:
+        from planning import start_planning
+        planner = start_planning(Q, get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh))
+    
+    # for each episode ...
+    for train_ep in range(first_ep, globals.args.train_episodes):
+
+        apply_schedules(schedules, train_ep)
+        won, lost = games_won, games_lost
+        score, games_won, games_lost = train_episode(Q, games_won, games_lost, replay_buffer, profiler, early_stop, planner)
+        stats.episode_done(train_ep, score, games_won - won, games_lost - lost)
+
+        if globals.args.save_q is not None and globals.args.checkpoint_every > 0 and (train_ep + 1) % globals.args.checkpoint_every == 0:
+            from checkpoint import save_q_table
+            save_q_table(globals.args.save_q, Q, train_ep + 1)
 
         # evaluate the greedy policy
         if train_ep % globals.args.eval_every == 0:
-            avg_score = .0
-            scores = []
-            for eval_ep in range(0, globals.args.eval_episodes):
-                state = get_initial_state()
-                score = 0
-                max_allowed_steps = 300
-                while not is_final_state(state, score) and max_allowed_steps > 0:
-                    # choose one of the legal actions
-                    actions = get_legal_actions(state)                
-                    
-                    if globals.args.agent_strategy == "random":
-                        agent_action = choice(actions)
-                    else:
-                        agent_action = best_action(Q, state, actions)
-                        
-                    if globals.args.adversary_strategy == "random":
-                        adversary_action = choice(actions)
-                    elif globals.args.adversary_strategy == "greedy":           
-                        mirrored_state = get_mirrored_state(state)
-                        adversary_action = best_action(Q, mirrored_state, get_legal_actions(mirrored_state))
-                    elif globals.args.adversary_strategy == "almost_perfect":
-                        if random() < 0.3:
-                            adversary_action = choice(actions)
-                        else:
-                            ball_x, ball_y = state[0], state[1]
-                            velocity_x, velocity_y = state[2], state[3]
-                            paddle1_x, paddle1_y = state[4], state[5]
-                            if ball_y + velocity_y > paddle1_y:
-                                adversary_action = "DOWN"
-                            elif ball_y + velocity_y < paddle1_y:
-                                adversary_action = "UP"
-                            else:
-                                adversary_action = "STAY"
-                    state, reward = apply_actions(state, agent_action, adversary_action)
-                    score += reward
-                    
-                    max_allowed_steps -= 1
-                
-                scores.append(score)
-            avg_score = sum(scores)/float(len(scores))
-            eval_scores.append(avg_score)
-    
+            profiler.lap("other")
+            if eval_pool is None:
+                eval_scores.append(evaluate_policy(Q))
+            else:
+                eval_pool.submit(Q)
+            profiler.lap("eval")
+
+            known_scores = eval_scores if eval_pool is None else eval_pool.known_scores()
+            if known_scores:
+                stats.eval_done(train_ep, known_scores[-1])
+            stop = early_stop is not None and early_stop.should_stop(known_scores)
+            if stop:
+                print("Converged after %d episodes" % (train_ep + 1))
+            if on_eval is not None and on_eval(train_ep, known_scores):
+                stop = True
+            if stop:
+                # the rest of the run, plot and checkpoint included, sees the shortened run
+                globals.args.train_episodes = train_ep + 1
+
+        profiler.episode_done(train_ep, Q)
+        if train_ep + 1 >= globals.args.train_episodes:
+            break
+
+    if eval_pool is not None:
+        eval_scores = eval_pool.close()
+
+    if replay_buffer is not None:
+        replay_buffer.flush()
+    profiler.close(globals.args.train_episodes - 1, Q)
+    stats.close()
+
+    if globals.args.save_q is not None:
+        from checkpoint import save_q_table
+        save_q_table(globals.args.save_q, Q, max(first_ep, globals.args.train_episodes))
+
+    # a stats log keeps no per-episode scores
+    train_scores = getattr(stats, "train_scores", [])
+    return Q, train_scores, eval_scores, games_won, games_lost
+
+def q_learning():
+    reset_adversaries()
+    if globals.args.workers > 1:
+        from parallel import parallel_q_learning
+        initial_Q, trained_episodes = None, 0
+        if globals.args.load_q is not None:
+            from checkpoint import load_q_table
+            initial_Q, trained_episodes = load_q_table(globals.args.load_q)
+        Q, train_scores, eval_scores, games_won, games_lost = parallel_q_learning(train_episode, evaluate_policy, initial_Q, trained_episodes)
+        if globals.args.save_q is not None:
+            from checkpoint import save_q_table
+            save_q_table(globals.args.save_q, Q, max(trained_episodes, globals.args.train_episodes))
+    elif globals.args.actors > 0:
+        from actor_learner import actor_learner_q_learning
+        initial_Q, trained_episodes = None, 0
+        if globals.args.load_q is not None:
+            from checkpoint import load_q_table
+            initial_Q, trained_episodes = load_q_table(globals.args.load_q)
+        Q, train_scores, eval_scores, games_won, games_lost = actor_learner_q_learning(best_action, evaluate_policy, initial_Q, trained_episodes)
+        if globals.args.save_q is not None:
+            from checkpoint import save_q_table
+            save_q_table(globals.args.save_q, Q, max(trained_episodes, globals.args.train_episodes))
+    else:
+        if globals.args.seed is not None:
+            seed(globals.args.seed)
+        Q, train_scores, eval_scores, games_won, games_lost = serial_q_learning()
+
     if globals.args.final_show:
         agent_score = 0
         adversary_score = 0
+        adversary = get_adversary(globals.args.adversary_strategy, best_action, globals.args.adversary_refresh)
         for _ in range(globals.args.eval_episodes):
             score = 0
             max_allowed_steps = 500
@@ -177,24 +378,7 @@ def q_learning():
                     agent_action = choice(actions)
                 else:
                     agent_action = best_action(Q, state, actions)
-                if globals.args.adversary_strategy == "random":
-                    adversary_action = choice(actions)
-                elif globals.args.adversary_strategy == "greedy":       
-                    mirrored_state = get_mirrored_state(state)
-                    adversary_action = best_action(Q, mirrored_state, get_legal_actions(mirrored_state))
-                elif globals.args.adversary_strategy == "almost_perfect":
-                    if random() < 0.3:
-                        adversary_action = choice(actions)
-                    else:
-                        ball_x, ball_y = state[0], state[1]
-                        velocity_x, velocity_y = state[2], state[3]
-                        paddle1_x, paddle1_y = state[4], state[5]
-                        if ball_y + velocity_y > paddle1_y:
-                            adversary_action = "DOWN"
-                        elif ball_y + velocity_y < paddle1_y:
-                            adversary_action = "UP"
-                        else:
-                            adversary_action = "STAY"
+                adversary_action = adversary.act(Q, state, actions)
                 state, reward = apply_actions(state, agent_action, adversary_action)
                 
                 if reward == WIN_REWARD:
@@ -206,23 +390,29 @@ def q_learning():
                 
                 max_allowed_steps -= 1
                 
-    if globals.args.plot_scores:
+    if globals.args.plot_scores and globals.args.stats_log is not None and globals.args.workers <= 1 \
+            and globals.args.actors == 0:
+        from plot_stats import plot_log
+        plot_log(globals.args.stats_log)
+    elif globals.args.plot_scores:
         from matplotlib import pyplot as plt
         import numpy as np
+        # a resumed run only has scores for the episodes trained in this process
+        first_plot_ep = globals.args.train_episodes - len(train_scores)
         plt.xlabel("Episode")
         plt.ylabel("Average score")
         plt.plot(
-            np.linspace(1, globals.args.train_episodes, globals.args.train_episodes),
+            np.linspace(first_plot_ep + 1, globals.args.train_episodes, len(train_scores)),
             np.convolve(train_scores, [0.2,0.2,0.2,0.2,0.2], "same"),
             linewidth = 1.0, color = "blue"
         )
         plt.plot(
-            np.linspace(globals.args.eval_every, globals.args.train_episodes, len(eval_scores)),
+            np.linspace(first_plot_ep + globals.args.eval_every, globals.args.train_episodes, len(eval_scores)),
             eval_scores, linewidth = 2.0, color = "red"
         )
         plt.show()
         
-if __name__ == "__main__":
+def get_parser():
     parser = ArgumentParser()
     
 	# Board Parameters
@@ -238,12 +428,28 @@ if __name__ == "__main__":
                         help = "Strategy used by agent")
     parser.add_argument("--adversary_strategy", type = str, default = "random",
                         help = "Strategy used by opponent")                        
+    parser.add_argument("--adversary_refresh", type = int, default = 0,
+                        help = "Greedy adversary plays from an action table rebuilt from Q over ... episodes (0 queries Q live)")
     parser.add_argument("--learning_rate", type = float, default = 0.2,
                         help = "Learning rate")
     parser.add_argument("--discount", type = float, default = 0.9,
                         help = "Value for the discount factor")
     parser.add_argument("--epsilon", type = float, default = 0.1,
                         help = "Probability to choose a random action.")     
+    parser.add_argument("--q_store", type = str, default = "dict",
+                        choices = ["dict", "array", "tiles"],
+                        help = "Q-table storage: tuple-keyed dict, dense NumPy array or tile-coded linear approximation")
+    parser.add_argument("--symmetric", action = "store_true",
+                        help = "Share Q-values between states that mirror each other top to bottom (random and greedy adversaries)")
+    parser.add_argument("--num_tilings", type = int, default = 8,
+                        help = "Offset grids of the tiles store")
+    parser.add_argument("--num_tiles", type = int, default = 8,
+                        help = "Cells per feature of each grid of the tiles store")
+    parser.add_argument("--engine", type = str, default = "tuple",
+                        choices = ["tuple", "compact"],
+                        help = "Step games as pong.py state tuples or in place on a CompactState (array store only)")
+    parser.add_argument("--seed", type = int, default = None,
+                        help = "Random seed; worker i uses seed + i")
                         
     # Training and evaluation episodes
     parser.add_argument("--train_episodes", type = int, default = 1000,
@@ -252,7 +458,95 @@ if __name__ == "__main__":
                         help = "Evaluate policy every ... games.")
     parser.add_argument("--eval_episodes", type = int, default = 5,
                         help = "Number of games to play for evaluation.")
+    parser.add_argument("--eval_workers", type = int, default = 0,
+                        help = "Evaluate Q snapshots in up to ... background processes while training goes on.")
+
+    # Schedules and early stopping
+    parser.add_argument("--epsilon_schedule", type = str, default = "constant",
+                        choices = ["constant", "linear", "exponential", "inverse_time"],
+                        help = "Decay of epsilon from --epsilon to --epsilon_end")
+    parser.add_argument("--epsilon_end", type = float, default = 0.01,
+                        help = "Epsilon at the end of the decay")
+    parser.add_argument("--learning_rate_schedule", type = str, default = "constant",
+                        choices = ["constant", "linear", "exponential", "inverse_time"],
+                        help = "Decay of the learning rate from --learning_rate to --learning_rate_end")
+    parser.add_argument("--learning_rate_end", type = float, default = 0.01,
+                        help = "Learning rate at the end of the decay")
+    parser.add_argument("--decay_episodes", type = int, default = 0,
+                        help = "Episodes the decays take (0 spreads them over --train_episodes)")
+    parser.add_argument("--early_stop_patience", type = int, default = 0,
+                        help = "Stop once ... evaluations in a row did not beat the best earlier one (0 never stops)")
+    parser.add_argument("--early_stop_min_delta", type = float, default = 0.0,
+                        help = "Improvement over the best evaluation that counts as beating it")
+    parser.add_argument("--q_tolerance", type = float, default = 0.0,
+                        help = "Stop once no Q update between two evaluations changed a value by this much (0 never stops)")
                         
+    # Model-based planning
+    parser.add_argument("--planning", type = str, default = None,
+                        choices = ["sweeping", "value_iteration"],
+                        help = "Use pong.py as a model: prioritized sweeping after every real step, or value iteration before training")
+    parser.add_argument("--planning_steps", type = int, default = 10,
+                        help = "Model backups after every real step (prioritized sweeping)")
+    parser.add_argument("--planning_threshold", type = float, default = 1e-4,
+                        help = "Smallest Bellman error that queues a state for a backup (prioritized sweeping)")
+    parser.add_argument("--planning_tolerance", type = float, default = 1e-3,
+                        help = "Stop value iteration once no Q-value changes by this much in a sweep")
+
+    # Checkpoints
+    parser.add_argument("--save_q", type = str, default = None,
+                        help = "Save the Q-table to this checkpoint file")
+    parser.add_argument("--load_q", type = str, default = None,
+                        help = "Start from this checkpoint and train on up to --train_episodes episodes in total")
+    parser.add_argument("--checkpoint_every", type = int, default = 0,
+                        help = "Also save the checkpoint every ... episodes (single-process training).")
+
+    # Experience replay
+    parser.add_argument("--replay_size", type = int, default = 0,
+                        help = "Keep the last ... transitions and replay them (0 disables replay)")
+    parser.add_argument("--replay_batch", type = int, default = 64,
+                        help = "Transitions replayed in one vectorized Q update")
+    parser.add_argument("--replay_every", type = int, default = 4,
+                        help = "Replay a batch every ... steps")
+    parser.add_argument("--replay_prioritized", dest = "replay_prioritized", action = "store_true",
+                        help = "Replay transitions with large TD error more often")
+    parser.add_argument("--replay_dir", type = str, default = None,
+                        help = "Also spill the recorded transitions to this directory")
+
+    # Profiling
+    parser.add_argument("--profile", type = str, default = None,
+                        help = "Append per-phase timings and Q-table size as JSON lines to this file (single-process training)")
+    parser.add_argument("--profile_every", type = int, default = 100,
+                        help = "Episodes per profile record")
+    parser.add_argument("--profile_pstats", type = str, default = None,
+                        help = "Also run under cProfile and dump the pstats to this file")
+
+    # Statistics
+    parser.add_argument("--stats_log", type = str, default = None,
+                        help = "Append running score statistics to this binary log instead of printing every episode (single-process training)")
+    parser.add_argument("--stats_every", type = int, default = 100,
+                        help = "Episodes per stats log record")
+
+    # Parallel training
+    parser.add_argument("--workers", type = int, default = 1,
+                        help = "Number of training processes sharing one Q-table")
+    parser.add_argument("--parallel_mode", type = str, default = "hogwild",
+                        choices = ["hogwild", "average"],
+                        help = "Lock-free updates of the shared table or periodic averaging of worker tables")
+    parser.add_argument("--sync_every", type = int, default = 10,
+                        help = "Episodes between two averagings of the worker tables")
+
+    # Actor / learner training
+    parser.add_argument("--actors", type = int, default = 0,
+                        help = "Number of actor processes feeding transitions to one learner (0 trains in one loop)")
+    parser.add_argument("--actor_games", type = int, default = 64,
+                        help = "Games each actor steps at once; one tick of them is one batch")
+    parser.add_argument("--queue_size", type = int, default = 8,
+                        help = "Batches an actor can queue before it waits for the learner")
+    parser.add_argument("--policy_refresh", type = int, default = 50,
+                        help = "Batches an actor plays before copying the learner's table again")
+    parser.add_argument("--actor_stats_every", type = int, default = 1000,
+                        help = "Learner batches between two lines of queue and policy lag counters")
+
     # Display
     parser.add_argument("--verbose", dest="verbose",
                         action = "store_true", help = "Print each state")
@@ -265,8 +559,77 @@ if __name__ == "__main__":
     parser.add_argument("--final_show", dest = "final_show",
                         action = "store_true",
                         help = "Demonstrate final strategy.")
-                        
-    globals.args = parser.parse_args()
-    q_learning()
+
+    return parser
+
+def parse_args(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    # apply_schedules overwrites epsilon and learning_rate while training
+    args.epsilon_start = args.epsilon
+    args.learning_rate_start = args.learning_rate
+    if args.load_q is not None:
+        from checkpoint import load_header
+        # checkpoints always load as a dense table, symmetric or not as saved
+        args.q_store = "array"
+        try:
+            header = load_header(args.load_q)
+        except (IOError, ValueError) as e:
+            parser.error("--load_q: %s" % e)
+        for field in ("board_width", "board_height", "paddle_size"):
+            if header[field] != getattr(args, field):
+                parser.error("--load_q %s was trained with --%s %d, this run has %d" % (
+                    args.load_q, field, header[field], getattr(args, field)))
+        args.symmetric = bool(header["symmetric"])
+    if args.replay_size > 0 and args.q_store not in ("array", "tiles"):
+        parser.error("--replay_size needs --q_store array or tiles")
+    if args.replay_size > 0 and args.workers > 1:
+        parser.error("--replay_size needs single-process training, --workers trains without a replay buffer")
+    if args.replay_size > 0 and args.actors > 0:
+        parser.error("--replay_size needs single-process training, --actors learns from the actors' batches instead")
+    if args.eval_workers > 0 and args.workers > 1:
+        parser.error("--eval_workers needs serial or --actors training, --workers evaluates in its own processes")
+    if args.adversary_refresh > 0 and args.q_store != "array":
+        parser.error("--adversary_refresh needs --q_store array, the action table is built from table rows")
+    if args.save_q is not None and args.q_store == "tiles":
+        parser.error("--save_q needs --q_store dict or array, checkpoints hold tables")
+    if args.workers > 1 and args.q_store != "array":
+        parser.error("--workers needs --q_store array, the dict store cannot be shared between processes")
+    if args.actors > 0 and args.q_store != "array":
+        parser.error("--actors needs --q_store array, the dict store cannot be shared between processes")
+    if args.planning is not None and (args.q_store != "array" or args.symmetric):
+        parser.error("--planning needs --q_store array without --symmetric, the model works on table rows")
+    if args.planning is not None and (args.workers > 1 or args.actors > 0):
+        parser.error("--planning trains in a single process")
+    if args.engine == "compact" and (args.q_store != "array" or args.symmetric):
+        parser.error("--engine compact needs --q_store array without --symmetric, it indexes table rows")
+    if args.engine == "compact" and (args.replay_size > 0 or args.verbose):
+        parser.error("--engine compact does not record or display states, drop --replay_size and --verbose")
+    if args.symmetric and args.adversary_strategy == "almost_perfect":
+        parser.error("--symmetric needs a random or greedy adversary, almost_perfect tracks the ball with "
+                     "its paddle's bottom cell, so its mirror image plays differently")
+    if (args.early_stop_patience > 0 or args.q_tolerance > 0) and (args.workers > 1 or args.actors > 0):
+        parser.error("--early_stop_patience and --q_tolerance need single-process training")
+    if args.stats_log is not None and (args.workers > 1 or args.actors > 0):
+        parser.error("--stats_log needs single-process training")
+    if args.stats_log is not None and args.eval_workers > 0:
+        parser.error("--stats_log records each evaluation score with its episode, drop --eval_workers "
+                     "whose scores arrive episodes later")
+    if args.profile is not None and (args.workers > 1 or args.actors > 0):
+        parser.error("--profile needs single-process training, use --profile_pstats for a parallel run")
+    if args.actors > 0 and args.workers > 1:
+        parser.error("--actors and --workers are two different ways to train in parallel, pick one")
+    return args
+
+if __name__ == "__main__":
+    globals.args = parse_args()
+
+    if globals.args.profile_pstats is not None:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.runcall(q_learning)
+        profile.dump_stats(globals.args.profile_pstats)
+    else:
+        q_learning()
     
     
\ No newline at end of file
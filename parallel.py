@@ -0,0 +1,183 @@
+import random, time
+import multiprocessing as mp
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+from qtable import QTable, get_num_rows
+from schedules import make_schedules, apply_schedules
+
+def make_shared_q_table(symmetric=False):
+    # RawArray lives in shared memory that forked workers map instead of copy; it starts zeroed
+    values = mp.RawArray('f', get_num_rows(symmetric) * len(ACTIONS))
+    return QTable(np.frombuffer(values, dtype=np.float32).reshape(-1, len(ACTIONS)), symmetric)
+
+def get_first_eval_ep(first_ep=0):
+    # the single-process loop evaluates after the multiples of eval_every from first_ep on
+    return (first_ep + globals.args.eval_every - 1) // globals.args.eval_every * globals.args.eval_every
+
+def get_num_eval_points(first_ep=0):
+    return len(range(get_first_eval_ep(first_ep), globals.args.train_episodes, globals.args.eval_every))
+
+def worker_seed(worker_id):
+    return globals.args.seed + worker_id
+
+def get_num_rounds(first_ep=0):
+    # every averaging worker goes through the same number of merges, even with an uneven episode split
+    num_episodes = max(globals.args.train_episodes - first_ep, 0)
+    episodes_per_worker = (num_episodes + globals.args.workers - 1) // globals.args.workers
+    return (episodes_per_worker + globals.args.sync_every - 1) // globals.args.sync_every
+
+def train_worker(args, worker_id, first_ep, train_episode, evaluate_policy, shared_Q, local_Q,
+                 train_scores, eval_scores, games, synced, resumed):
+    globals.args = args
+    random.seed(worker_seed(worker_id))
+    np.random.seed(worker_seed(worker_id))
+
+    # hogwild workers update the shared table in place without locks,
+    # averaging workers learn on their own table and merge it every sync_every episodes
+    Q = shared_Q if local_Q is None else local_Q
+    episodes = list(range(first_ep + worker_id, args.train_episodes, args.workers))
+    first_eval_ep = get_first_eval_ep(first_ep)
+    schedules = make_schedules()
+    games_won = 0
+    games_lost = 0
+
+    if local_Q is None:
+        rounds = [episodes]
+    else:
+        local_Q.values[:] = shared_Q.values
+        rounds = [episodes[i * args.sync_every:(i + 1) * args.sync_every] for i in range(get_num_rounds(first_ep))]
+
+    for round_episodes in rounds:
+        for train_ep in round_episodes:
+            print("Episode %6d / %6d" % (train_ep, args.train_episodes))
+
+            apply_schedules(schedules, train_ep)
+            score, games_won, games_lost = train_episode(Q, games_won, games_lost)
+            train_scores[train_ep - first_ep] = score
+
+            # evaluate the greedy policy
+            if train_ep % args.eval_every == 0:
+                eval_scores[(train_ep - first_eval_ep) // args.eval_every] = evaluate_policy(Q)
+
+        if local_Q is not None:
+            synced.put(worker_id)
+            resumed[worker_id].acquire()
+            local_Q.values[:] = shared_Q.values
+
+    games[2 * worker_id] = games_won
+    games[2 * worker_id + 1] = games_lost
+
+def average_q_tables(shared_Q, local_Qs):
+    shared_Q.values[:] = local_Qs[0].values
+    for local_Q in local_Qs[1:]:
+        shared_Q.values += local_Q.values
+    shared_Q.values /= len(local_Qs)
+
+def parallel_q_learning(train_episode, evaluate_policy, initial_Q=None, first_ep=0):
+    """Run the training episodes across globals.args.workers processes.
+
+    Episodes first_ep to train_episodes are dealt round-robin, so train_scores
+    and eval_scores come back in the same episode order as the single-process
+    loop. Training starts from the values of initial_Q when given, which was
+    trained for first_ep episodes, like a resumed single-process run.
+    """
+    if globals.args.seed is None:
+        globals.args.seed = int(time.time())
+
+    num_workers = globals.args.workers
+    # a loaded table keeps the symmetry it was trained with
+    symmetric = initial_Q.symmetric if initial_Q is not None else globals.args.symmetric
+    shared_Q = make_shared_q_table(symmetric)
+    if initial_Q is not None:
+        shared_Q.values[:] = initial_Q.values
+    if globals.args.parallel_mode == "average":
+        local_Qs = [make_shared_q_table(symmetric) for _ in range(num_workers)]
+    else:
+        local_Qs = [None] * num_workers
+
+    train_scores = mp.RawArray('d', max(globals.args.train_episodes - first_ep, 0))
+    eval_scores = mp.RawArray('d', get_num_eval_points(first_ep))
+    games = mp.RawArray('l', 2 * num_workers)
+    synced = mp.Queue()
+    resumed = [mp.Semaphore(0) for _ in range(num_workers)]
+
+    workers = [
+        mp.Process(target=train_worker, args=(globals.args, worker_id, first_ep, train_episode, evaluate_policy,
+                                              shared_Q, local_Qs[worker_id], train_scores, eval_scores,
+                                              games, synced, resumed))
+        for worker_id in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    if globals.args.parallel_mode == "average":
+        for _ in range(get_num_rounds(first_ep)):
+            for _ in range(num_workers):
+                synced.get()
+            average_q_tables(shared_Q, local_Qs)
+            for semaphore in resumed:
+                semaphore.release()
+
+    for worker in workers:
+        worker.join()
+
+    games_won = sum(games[0::2])
+    games_lost = sum(games[1::2])
+    return shared_Q, list(train_scores), list(eval_scores), games_won, games_lost
+
+def eval_worker(evaluate_policy, Q, eval_index, results):
+    # Q is this process' copy of the table at fork time, see EvalPool, so the learner never waits on it
+    if globals.args.seed is None:
+        random.seed()
+    else:
+        random.seed(globals.args.seed + eval_index)
+    results.put((eval_index, evaluate_policy(Q)))
+
+class EvalPool(object):
+    """Evaluates greedy-policy snapshots of Q in forked processes.
+
+    Forking gives each evaluation a copy-on-write snapshot of a table in
+    private memory (the dict store, a plain or "c" mode QTable) for the price
+    of the page tables. Memory the processes share, a RawArray or writable
+    memmap table, is not copied on fork: submit a copy of such a table. At
+    most num_processes run at once; scores are kept in submission order.
+    """
+
+    def __init__(self, evaluate_policy, num_processes):
+        self.evaluate_policy = evaluate_policy
+        self.num_processes = num_processes
+        self.results = mp.Queue()
+        self.running = {}
+        self.eval_scores = []
+
+    def submit(self, Q):
+        while len(self.running) >= self.num_processes:
+            self.collect()
+        eval_index = len(self.eval_scores)
+        self.eval_scores.append(None)
+        process = mp.Process(target=eval_worker, args=(self.evaluate_policy, Q, eval_index, self.results))
+        process.start()
+        self.running[eval_index] = process
+
+    def collect(self):
+        eval_index, score = self.results.get()
+        self.eval_scores[eval_index] = score
+        self.running.pop(eval_index).join()
+
+    def known_scores(self):
+        # the scores, in order, up to the first evaluation still running
+        while not self.results.empty():
+            self.collect()
+        if None in self.eval_scores:
+            return self.eval_scores[:self.eval_scores.index(None)]
+        return list(self.eval_scores)
+
+    def close(self):
+        while self.running:
+            self.collect()
+        return self.eval_scores
@@ -0,0 +1,197 @@
+import heapq, time
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+from qtable import encode_states, decode_states, get_num_states
+from batch_env import step_states, BALL_X, BALL_Y, VELOCITY_X, VELOCITY_Y, PADDLE1_Y, PADDLE2_X, PADDLE2_Y
+from policies import AlmostPerfectPolicy, GreedyPolicy
+
+class PongModel(object):
+    """The dynamics of pong.py as tables over encoded states.
+
+    apply_actions is deterministic once both actions are known, so every
+    (state, agent action, adversary action) has one next state and one
+    reward: next_rows and rewards, both of shape (num_states, 3, 3). Rows
+    whose ball is at either edge are final and have no value. The score and
+    step caps of an episode are not part of the state, so the model leaves
+    them out.
+    """
+
+    def __init__(self):
+        num_states = get_num_states()
+        fields = decode_states(np.arange(num_states))
+        states = np.zeros((num_states, 8), dtype=np.int64)
+        for column, field in zip((BALL_X, BALL_Y, VELOCITY_X, VELOCITY_Y, PADDLE1_Y, PADDLE2_Y), fields):
+            states[:, column] = field
+        states[:, PADDLE2_X] = globals.args.board_width - 1
+
+        self.final = (fields[0] == 0) | (fields[0] == globals.args.board_width - 1)
+        self.next_rows = np.zeros((num_states, len(ACTIONS), len(ACTIONS)), dtype=np.int32)
+        self.rewards = np.zeros((num_states, len(ACTIONS), len(ACTIONS)), dtype=np.float32)
+        for agent_action in range(len(ACTIONS)):
+            for adversary_action in range(len(ACTIONS)):
+                next_states = states.copy()
+                self.rewards[:, agent_action, adversary_action] = step_states(
+                    next_states, np.full(num_states, agent_action), np.full(num_states, adversary_action))
+                next_rows = encode_states(
+                    next_states[:, BALL_X], next_states[:, BALL_Y], next_states[:, VELOCITY_X],
+                    next_states[:, VELOCITY_Y], next_states[:, PADDLE1_Y], next_states[:, PADDLE2_Y])
+                # final rows and rows no game reaches, with the ball on a wall moving
+                # into it, step off the board; they lead to row 0, a final row, instead
+                off_board = ((next_states[:, BALL_X] < 0) | (next_states[:, BALL_X] > globals.args.board_width - 1) |
+                             (next_states[:, BALL_Y] < 0) | (next_states[:, BALL_Y] > globals.args.board_height - 1))
+                next_rows[off_board] = 0
+                self.next_rows[:, agent_action, adversary_action] = next_rows
+        self.predecessor_rows = None
+
+    def check_table(self, Q):
+        # the model's rows are the states of the whole board, a symmetric table only holds half of them
+        if len(Q.values) != len(self.final):
+            raise ValueError("planning needs a table with one row per state, %d rows != %d states" % (
+                len(Q.values), len(self.final)))
+
+    def build_predecessors(self):
+        # CSR-style reverse of next_rows: the rows leading to row r are
+        # predecessor_rows[predecessor_starts[r]:predecessor_starts[r + 1]]
+        targets = self.next_rows.ravel()
+        order = np.argsort(targets, kind="mergesort")
+        pairs = len(ACTIONS) * len(ACTIONS)
+        self.predecessor_rows = (order // pairs).astype(np.int32)
+        self.predecessor_starts = np.searchsorted(targets[order], np.arange(len(self.final) + 1))
+
+    def predecessors(self, row):
+        if self.predecessor_rows is None:
+            self.build_predecessors()
+        rows = np.unique(self.predecessor_rows[self.predecessor_starts[row]:self.predecessor_starts[row + 1]])
+        return rows[~self.final[rows]]
+
+def adversary_probabilities(Q, adversary, rows):
+    # (len(rows), 3) probabilities of the adversary's actions in the encoded states rows
+    probabilities = np.full((len(rows), len(ACTIONS)), 1.0 / len(ACTIONS))
+    if isinstance(adversary, GreedyPolicy):
+        # self-play follows Q as it is now
+        probabilities[:] = 0.0
+        probabilities[np.arange(len(rows)), adversary.mirrored_best_actions(Q, rows)] = 1.0
+    elif isinstance(adversary, AlmostPerfectPolicy):
+        if adversary.table is None:
+            adversary.compile()
+        probabilities *= adversary.random_rate
+        probabilities[np.arange(len(rows)), adversary.table[rows]] += 1.0 - adversary.random_rate
+    return probabilities
+
+def backup(model, Q, probabilities, rows, discount):
+    """Expected Bellman backup of Q in the encoded states rows.
+
+    Returns the (len(rows), 3) values of the agent's actions, averaged over
+    the adversary's actions with their probabilities in those states, see
+    adversary_probabilities, and with final next states worth nothing.
+    """
+    next_rows = model.next_rows[rows]
+    next_values = Q.values[next_rows].max(axis=-1)
+    next_values[model.final[next_rows]] = 0.0
+    targets = model.rewards[rows] + discount * next_values
+    return (targets * probabilities[:, None, :]).sum(axis=2)
+
+def value_iteration(model, Q, adversary, discount, tolerance, chunk_size=65536, max_sweeps=1000):
+    """Back up every state of Q in place until no value changes by tolerance.
+
+    States are swept in chunks so the gathered next values stay small, and
+    each chunk sees the chunks updated before it. Returns the sweeps made.
+    """
+    model.check_table(Q)
+    live_rows = np.flatnonzero(~model.final)
+    Q.values[model.final] = 0.0
+    for sweep in range(max_sweeps):
+        start = time.time()
+        max_change = 0.0
+        for chunk in range(0, len(live_rows), chunk_size):
+            rows = live_rows[chunk:chunk + chunk_size]
+            values = backup(model, Q, adversary_probabilities(Q, adversary, rows), rows, discount)
+            max_change = max(max_change, float(np.abs(values - Q.values[rows]).max()))
+            Q.values[rows] = values
+        print("Sweep %4d  max change %10.6f  %.2f s" % (sweep, max_change, time.time() - start))
+        if max_change < tolerance:
+            return sweep + 1
+    return max_sweeps
+
+class PrioritizedSweeping(object):
+    """Model backups around the states real steps go through.
+
+    After every real step, step() queues the state if its Bellman error is
+    above threshold and then backs up the `steps` queued states with the
+    largest errors. A backed up state queues those of its predecessors whose
+    error it pushed above threshold, so a change spreads backwards from
+    where it happened.
+    """
+
+    def __init__(self, model, adversary, steps, threshold):
+        self.model = model
+        self.adversary = adversary
+        self.steps = steps
+        self.threshold = threshold
+        # the error each queued state was queued with, 0 when it is not queued
+        self.priorities = np.zeros(len(model.final))
+        self.queue = []
+        # only self-play depends on Q, the other adversaries' moves are tabulated once
+        self.probabilities = None
+        if not isinstance(adversary, GreedyPolicy):
+            self.probabilities = adversary_probabilities(None, adversary, np.arange(len(model.final)))
+
+    def backup(self, Q, rows):
+        if self.probabilities is None:
+            probabilities = adversary_probabilities(Q, self.adversary, rows)
+        else:
+            probabilities = self.probabilities[rows]
+        return backup(self.model, Q, probabilities, rows, globals.args.discount)
+
+    def push(self, Q, rows):
+        errors = np.abs(self.backup(Q, rows) - Q.values[rows]).max(axis=1)
+        for row, error in zip(rows.tolist(), errors.tolist()):
+            if error > self.threshold and error > self.priorities[row]:
+                self.priorities[row] = error
+                heapq.heappush(self.queue, (-error, row))
+
+    def step(self, Q, row):
+        # returns the largest change of a backup
+        if not self.model.final[row]:
+            self.push(Q, np.array([row]))
+        max_change = 0.0
+        for _ in range(self.steps):
+            row = self.pop()
+            if row is None:
+                break
+            rows = np.array([row])
+            values = self.backup(Q, rows)
+            max_change = max(max_change, float(np.abs(values - Q.values[rows]).max()))
+            Q.values[rows] = values
+            self.push(Q, self.model.predecessors(row))
+        return max_change
+
+    def pop(self):
+        # the queued row with the largest error, skipping entries a larger error replaced
+        while self.queue:
+            error, row = heapq.heappop(self.queue)
+            if -error == self.priorities[row]:
+                self.priorities[row] = 0.0
+                return row
+        return None
+
+def start_planning(Q, adversary):
+    """Set up globals.args.planning for training Q against adversary.
+
+    value_iteration solves Q up front and returns None; sweeping returns the
+    PrioritizedSweeping planner train_episode hands every real step to.
+    """
+    if globals.args.planning == "value_iteration":
+        start = time.time()
+        sweeps = value_iteration(PongModel(), Q, adversary, globals.args.discount, globals.args.planning_tolerance)
+        print("Value iteration converged in %d sweeps, %.1f s" % (sweeps, time.time() - start))
+    elif globals.args.planning == "sweeping":
+        model = PongModel()
+        model.check_table(Q)
+        return PrioritizedSweeping(model, adversary, globals.args.planning_steps, globals.args.planning_threshold)
+    return None
@@ -0,0 +1,51 @@
+# Plots a stats log written by main.py --stats_log. The log is memory mapped
+# and strided down to at most --max_points records, so the plot does not read
+# a whole long run.
+#
+#   python plot_stats.py stats.bin --out stats.png
+from argparse import ArgumentParser
+
+import numpy as np
+
+from stats import load_stats
+
+def plot_log(path, max_points=2000, out=None):
+    from matplotlib import pyplot as plt
+
+    records = load_stats(path)
+    if len(records) == 0:
+        print("%s holds no records" % path)
+        return
+    step = max(1, -(-len(records) // max_points))
+    records = np.array(records[::step])
+    episodes = records["episode"] + 1
+
+    figure, score_axis = plt.subplots()
+    score_axis.set_xlabel("Episode")
+    score_axis.set_ylabel("Score")
+    score_axis.fill_between(episodes, records["min"], records["max"], color = "blue", alpha = 0.15)
+    score_axis.plot(episodes, records["mean"], linewidth = 0.5, color = "blue")
+    score_axis.plot(episodes, records["moving_average"], linewidth = 1.5, color = "blue")
+    evaluated = ~np.isnan(records["eval_score"])
+    score_axis.plot(episodes[evaluated], records["eval_score"][evaluated], linewidth = 2.0, color = "red")
+
+    win_axis = score_axis.twinx()
+    win_axis.set_ylabel("Win rate")
+    win_axis.set_ylim(0.0, 1.0)
+    win_axis.plot(episodes, records["win_rate"], linewidth = 1.0, color = "green")
+
+    if out is None:
+        plt.show()
+    else:
+        figure.savefig(out)
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("log", type = str,
+                        help = "Stats log written by main.py --stats_log")
+    parser.add_argument("--max_points", type = int, default = 2000,
+                        help = "Plot at most ... records, evenly strided")
+    parser.add_argument("--out", type = str, default = None,
+                        help = "Save the plot to this image file instead of showing it")
+    plot_args = parser.parse_args()
+    plot_log(plot_args.log, plot_args.max_points, plot_args.out)
@@ -0,0 +1,166 @@
+from random import choice, random
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS, get_mirrored_state, get_legal_actions
+from qtable import QTable, ACTION_INDEX, encode_state, decode_states, get_num_states, get_state_strides
+from compact import ACTION_INDICES
+
+class Policy(object):
+    """An adversary strategy.
+
+    act(Q, state, legal_actions) returns an action for the scalar loop,
+    act_compact(Q, state) the same action as an index for a CompactState,
+    with the same draws from random, and act_batch(Q, indices, rng) action
+    indices for a batch of encoded states, see BatchPongEnv.encode.
+    episode_done(Q) is called after every training episode.
+    """
+
+    def episode_done(self, Q):
+        pass
+
+class RandomPolicy(Policy):
+    """Plays uniformly random moves."""
+
+    def act(self, Q, state, legal_actions):
+        return choice(legal_actions)
+
+    def act_compact(self, Q, state):
+        return choice(ACTION_INDICES)
+
+    def act_batch(self, Q, indices, rng=np.random):
+        return rng.randint(0, len(ACTIONS), len(indices))
+
+class AlmostPerfectPolicy(Policy):
+    """Tracks the ball with its paddle, except for a random move 30% of the time.
+
+    The tracking move only depends on the state, so it compiles into a table
+    of action indices and a batch of moves is a single gather.
+    """
+
+    random_rate = 0.3
+
+    def __init__(self):
+        self.table = None
+
+    def act(self, Q, state, legal_actions):
+        if random() < self.random_rate:
+            return choice(legal_actions)
+        ball_x, ball_y = state[0], state[1]
+        velocity_x, velocity_y = state[2], state[3]
+        paddle1_x, paddle1_y = state[4], state[5]
+        if ball_y + velocity_y > paddle1_y:
+            return "DOWN"
+        elif ball_y + velocity_y < paddle1_y:
+            return "UP"
+        else:
+            return "STAY"
+
+    def act_compact(self, Q, state):
+        if random() < self.random_rate:
+            return choice(ACTION_INDICES)
+        target = state.ball_y + state.velocity_y
+        if target > state.paddle1_y:
+            return ACTION_INDEX["DOWN"]
+        elif target < state.paddle1_y:
+            return ACTION_INDEX["UP"]
+        else:
+            return ACTION_INDEX["STAY"]
+
+    def compile(self):
+        ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y = decode_states(np.arange(get_num_states()))
+        target = ball_y + velocity_y
+        self.table = np.full(len(target), ACTION_INDEX["STAY"], dtype=np.int8)
+        self.table[target > paddle1_y] = ACTION_INDEX["DOWN"]
+        self.table[target < paddle1_y] = ACTION_INDEX["UP"]
+
+    def act_batch(self, Q, indices, rng=np.random):
+        if self.table is None:
+            self.compile()
+        actions = self.table[indices].astype(np.int64)
+        random_moves = rng.random_sample(len(indices)) < self.random_rate
+        actions[random_moves] = rng.randint(0, len(ACTIONS), random_moves.sum())
+        return actions
+
+class GreedyPolicy(Policy):
+    """Self-play: the greedy action of Q in the mirrored state.
+
+    With refresh_every > 0 and the array store the moves come from a table of
+    action indices instead of probing Q live. Each episode recomputes the next
+    1/refresh_every of its rows, so the whole table catches up with Q every
+    refresh_every episodes at an even cost per episode.
+    """
+
+    def __init__(self, best_action, refresh_every):
+        self.best_action = best_action
+        self.refresh_every = refresh_every
+        self.strides = get_state_strides()
+        self.table = None
+        self.cursor = 0
+
+    def compiles(self, Q):
+        return self.refresh_every > 0 and isinstance(Q, QTable)
+
+    def mirrored_best_actions(self, Q, indices):
+        # greedy action indices in the mirrored encoded states, see get_mirrored_state
+        ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y = decode_states(indices)
+        return Q.best_actions(globals.args.board_width - 1 - ball_x, ball_y, -velocity_x, velocity_y,
+                              paddle2_y, paddle1_y)
+
+    def compile(self, Q, start=0, stop=None):
+        if self.table is None:
+            self.table = np.zeros(get_num_states(), dtype=np.int8)
+        indices = np.arange(get_num_states())[start:stop]
+        self.table[indices] = self.mirrored_best_actions(Q, indices)
+
+    def act(self, Q, state, legal_actions):
+        if not self.compiles(Q):
+            mirrored_state = get_mirrored_state(state)
+            return self.best_action(Q, mirrored_state, get_legal_actions(mirrored_state))
+        if self.table is None:
+            self.compile(Q)
+        return ACTIONS[self.table.item(encode_state(state, self.strides))]
+
+    def act_compact(self, Q, state):
+        if not self.compiles(Q):
+            return ACTION_INDEX[self.act(Q, state.to_tuple(), ACTIONS)]
+        if self.table is None:
+            self.compile(Q)
+        return self.table.item(state.index())
+
+    def act_batch(self, Q, indices, rng=np.random):
+        if self.refresh_every == 0:
+            return self.mirrored_best_actions(Q, indices)
+        if self.table is None:
+            self.compile(Q)
+        return self.table[indices].astype(np.int64)
+
+    def episode_done(self, Q):
+        if not self.compiles(Q) or self.table is None:
+            return
+        chunk = (len(self.table) + self.refresh_every - 1) // self.refresh_every
+        self.compile(Q, self.cursor, self.cursor + chunk)
+        self.cursor = (self.cursor + chunk) % (chunk * self.refresh_every)
+
+def make_adversary(strategy, best_action, refresh_every=0):
+    if strategy == "greedy":
+        return GreedyPolicy(best_action, refresh_every)
+    if strategy == "almost_perfect":
+        return AlmostPerfectPolicy()
+    return RandomPolicy()
+
+adversaries = {}
+
+def get_adversary(strategy, best_action, refresh_every=0):
+    # one adversary per configuration for the whole process, so compiled tables persist across episodes
+    key = (strategy, refresh_every, globals.args.board_width, globals.args.board_height, globals.args.paddle_size)
+    if key not in adversaries:
+        adversaries[key] = make_adversary(strategy, best_action, refresh_every)
+    return adversaries[key]
+
+def reset_adversaries():
+    # drop the tables compiled from the Q of a previous training run
+    adversaries.clear()
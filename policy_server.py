@@ -0,0 +1,201 @@
+# Headless policy server: answers "state -> action" requests from a saved Q-table.
+#
+#   python policy_server.py --load_q model.q --unix /tmp/pong.sock
+#   python policy_server.py --load_q model.q --tcp 127.0.0.1:7777
+#
+# Protocol: a client sends states as 8 little-endian int32 (the state tuple of
+# pong.py) and gets back one byte per state, the index of the chosen action in
+# ACTIONS, or INVALID_ACTION for a state outside the board. Requests may be
+# pipelined; answers come back in order.
+import os, socket, select, errno, struct
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+from checkpoint import load_header, load_q_table
+
+STATE_FORMAT = "<8i"
+STATE_SIZE = struct.calcsize(STATE_FORMAT)
+INVALID_ACTION = 255
+
+def parse_address(unix_path, tcp_address):
+    if unix_path is not None:
+        return socket.AF_UNIX, unix_path
+    host, port = tcp_address.rsplit(":", 1)
+    return socket.AF_INET, (host, int(port))
+
+class PolicyServer(object):
+    """Single-threaded select loop that micro-batches requests.
+
+    Every pass over the ready sockets gathers the complete requests of all
+    clients into one array and answers them with a single vectorized argmax
+    over the Q rows.
+    """
+
+    def __init__(self, Q, family, address):
+        self.Q = Q
+        self.family = family
+        self.address = address
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)
+        else:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(128)
+        self.listener.setblocking(False)
+        self.inbox = {}
+        self.outbox = {}
+
+    def act(self, states):
+        ball_x, ball_y = states[:, 0], states[:, 1]
+        velocity_x, velocity_y = states[:, 2], states[:, 3]
+        paddle1_y, paddle2_y = states[:, 5], states[:, 7]
+        valid = ((ball_x >= 0) & (ball_x < globals.args.board_width) &
+                 (ball_y >= 0) & (ball_y < globals.args.board_height) &
+                 (paddle1_y >= globals.args.paddle_size) & (paddle1_y < globals.args.board_height) &
+                 (paddle2_y >= globals.args.paddle_size) & (paddle2_y < globals.args.board_height))
+        # invalid states are looked up as a paddle at the top and answered with INVALID_ACTION
+        paddle_size = globals.args.paddle_size
+        actions = self.Q.best_actions(np.where(valid, ball_x, 0), np.where(valid, ball_y, 0), velocity_x, velocity_y,
+                                      np.where(valid, paddle1_y, paddle_size),
+                                      np.where(valid, paddle2_y, paddle_size)).astype(np.uint8)
+        actions[~valid] = INVALID_ACTION
+        return actions
+
+    def accept(self):
+        try:
+            conn, _ = self.listener.accept()
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        conn.setblocking(False)
+        if self.family == socket.AF_INET:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.inbox[conn] = b""
+        self.outbox[conn] = b""
+
+    def close(self, conn):
+        del self.inbox[conn]
+        del self.outbox[conn]
+        conn.close()
+
+    def receive(self, conn):
+        # returns the complete requests waiting on conn
+        try:
+            data = conn.recv(1 << 16)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return b""
+            data = b""
+        if not data:
+            self.close(conn)
+            return b""
+        buffered = self.inbox[conn] + data
+        complete = len(buffered) - len(buffered) % STATE_SIZE
+        self.inbox[conn] = buffered[complete:]
+        return buffered[:complete]
+
+    def send(self, conn):
+        try:
+            sent = conn.send(self.outbox[conn])
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            self.close(conn)
+            return
+        self.outbox[conn] = self.outbox[conn][sent:]
+
+    def serve_forever(self):
+        while True:
+            waiting = [conn for conn in self.outbox if self.outbox[conn]]
+            readable, writable, _ = select.select([self.listener] + list(self.inbox), waiting, [])
+
+            batch = []
+            for conn in readable:
+                if conn is self.listener:
+                    self.accept()
+                    continue
+                requests = self.receive(conn)
+                if requests:
+                    batch.append((conn, requests))
+
+            if batch:
+                states = np.frombuffer(b"".join(requests for _, requests in batch), dtype="<i4").reshape(-1, 8)
+                actions = self.act(states)
+                offset = 0
+                for conn, requests in batch:
+                    count = len(requests) // STATE_SIZE
+                    self.outbox[conn] += actions[offset:offset + count].tobytes()
+                    offset += count
+                    writable.append(conn)
+
+            for conn in set(writable):
+                if conn in self.outbox and self.outbox[conn]:
+                    self.send(conn)
+
+    def shutdown(self):
+        for conn in list(self.inbox):
+            self.close(conn)
+        self.listener.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+
+class PolicyClient(object):
+    """Blocking client for PolicyServer."""
+
+    def __init__(self, family, address):
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(address)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def act_indices(self, states):
+        self.sock.sendall(b"".join(struct.pack(STATE_FORMAT, *state) for state in states))
+        answer = b""
+        while len(answer) < len(states):
+            data = self.sock.recv(len(states) - len(answer))
+            if not data:
+                raise IOError("policy server closed the connection")
+            answer += data
+        return bytearray(answer)
+
+    def act(self, state):
+        return ACTIONS[self.act_indices([state])[0]]
+
+    def close(self):
+        self.sock.close()
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--load_q", type = str, required = True,
+                        help = "Q-table checkpoint to serve")
+    parser.add_argument("--unix", type = str, default = None,
+                        help = "Listen on this Unix socket path")
+    parser.add_argument("--tcp", type = str, default = "127.0.0.1:7777",
+                        help = "Listen on this host:port when --unix is not given")
+    server_args = parser.parse_args()
+
+    # the board geometry comes from the checkpoint itself
+    header = load_header(server_args.load_q)
+    globals.args = Namespace(board_width = header["board_width"], board_height = header["board_height"],
+                             paddle_size = header["paddle_size"], learning_rate = header["learning_rate"],
+                             discount = header["discount"], epsilon = header["epsilon"],
+                             symmetric = bool(header["symmetric"]))
+    Q, _ = load_q_table(server_args.load_q)
+
+    family, address = parse_address(server_args.unix, server_args.tcp)
+    server = PolicyServer(Q, family, address)
+    print("Serving %s (%d episodes) on %s" % (server_args.load_q, header["episodes"], address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
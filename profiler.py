@@ -0,0 +1,87 @@
+import sys, json, time, resource
+
+from qtable import QTable
+from approx import TileCodingQ
+
+PHASES = ["render", "select", "step", "update", "replay", "plan", "eval", "other"]
+
+class NullProfiler(object):
+    """Stands in for Profiler when profiling is off; every call is a no-op."""
+
+    def lap(self, phase):
+        pass
+
+    def episode_done(self, episode, Q):
+        pass
+
+    def close(self, episode, Q):
+        pass
+
+def get_q_size(Q):
+    # cheap enough to call while training: the dict figure is an estimate
+    if isinstance(Q, (QTable, TileCodingQ)):
+        return len(Q), Q.nbytes()
+    key_size = sys.getsizeof(((0,) * 8, "STAY")) + sys.getsizeof(0.0)
+    return len(Q), sys.getsizeof(Q) + len(Q) * key_size
+
+class Profiler(object):
+    """Charges wall time to training phases and streams it as JSON lines.
+
+    lap(phase) books the time since the previous lap to phase, so the hot
+    loop pays one clock read per phase boundary. Every `every` episodes a
+    record with the time per phase, steps/s, episodes/s and the Q-table size
+    is appended to out.
+    """
+
+    def __init__(self, out, every):
+        self.out = out
+        self.every = every
+        self.start = self.last_lap = self.window_start = time.time()
+        self.totals = dict((phase, 0.0) for phase in PHASES)
+        self.steps = 0
+        self.episodes = 0
+
+    def lap(self, phase):
+        now = time.time()
+        self.totals[phase] += now - self.last_lap
+        self.last_lap = now
+        if phase == "step":
+            self.steps += 1
+
+    def episode_done(self, episode, Q):
+        self.lap("other")
+        self.episodes += 1
+        if self.episodes >= self.every:
+            self.write(episode, Q)
+
+    def write(self, episode, Q):
+        now = time.time()
+        elapsed = max(now - self.window_start, 1e-9)
+        q_entries, q_bytes = get_q_size(Q)
+        record = {
+            "episode": episode,
+            "time": now - self.start,
+            "phase_seconds": self.totals,
+            "steps_per_sec": self.steps / elapsed,
+            "episodes_per_sec": self.episodes / elapsed,
+            "q_entries": q_entries,
+            "q_bytes": q_bytes,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        self.out.write(json.dumps(record, sort_keys=True) + "\n")
+        self.out.flush()
+
+        self.window_start = now
+        self.totals = dict((phase, 0.0) for phase in PHASES)
+        self.steps = 0
+        self.episodes = 0
+
+    def close(self, episode, Q):
+        if self.episodes > 0:
+            self.write(episode, Q)
+        self.out.close()
+
+def make_profiler(path, every):
+    if path is None:
+        return NullProfiler()
+    return Profiler(open(path, "a"), every)
@@ -0,0 +1,236 @@
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS
+from approx import TileCodingQ
+
+ACTION_INDEX = dict((action, i) for i, action in enumerate(ACTIONS))
+
+# Flipping the board top to bottom swaps UP and DOWN
+FLIPPED_ACTIONS = {"UP": "DOWN", "STAY": "STAY", "DOWN": "UP"}
+FLIPPED_ACTION_INDEX = np.array([ACTION_INDEX[FLIPPED_ACTIONS[action]] for action in ACTIONS])
+
+def get_num_paddle_positions():
+    # a paddle's y coordinate is its bottom cell and stays in [paddle_size, board_height - 1]
+    return globals.args.board_height - globals.args.paddle_size
+
+def get_num_states():
+    num_paddle_positions = get_num_paddle_positions()
+    return globals.args.board_width * globals.args.board_height * 2 * 2 * num_paddle_positions * num_paddle_positions
+
+def get_num_rows(symmetric=False):
+    # a symmetric table only keeps the states whose ball moves down
+    if symmetric:
+        return get_num_states() // 2
+    return get_num_states()
+
+def get_state_strides(symmetric=False):
+    # multipliers turning (ball_x, ball_y, velocity_x > 0, velocity_y > 0, paddle1_y, paddle2_y) into an index
+    num_paddle_positions = get_num_paddle_positions()
+    paddle2_stride = 1
+    paddle1_stride = paddle2_stride * num_paddle_positions
+    if symmetric:
+        # velocity_y is always positive there and takes no room
+        velocity_y_stride = 0
+        velocity_x_stride = paddle1_stride * num_paddle_positions
+    else:
+        velocity_y_stride = paddle1_stride * num_paddle_positions
+        velocity_x_stride = velocity_y_stride * 2
+    ball_y_stride = velocity_x_stride * 2
+    ball_x_stride = ball_y_stride * globals.args.board_height
+    return (ball_x_stride, ball_y_stride, velocity_x_stride, velocity_y_stride, paddle1_stride, paddle2_stride)
+
+def encode_state(state, strides=None):
+    # the paddles' x coordinates never change, so they are left out of the index
+    if strides is None:
+        strides = get_state_strides()
+    offset = globals.args.paddle_size * (strides[4] + strides[5])
+    return (state[0] * strides[0] + state[1] * strides[1] + (state[2] > 0) * strides[2] +
+            (state[3] > 0) * strides[3] + state[5] * strides[4] + state[7] * strides[5] - offset)
+
+def encode_states(ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y, strides=None):
+    # vectorized encode_state over NumPy arrays of state fields
+    if strides is None:
+        strides = get_state_strides()
+    offset = globals.args.paddle_size * (strides[4] + strides[5])
+    return (ball_x.astype(np.int64) * strides[0] + ball_y * strides[1] + (velocity_x > 0) * strides[2] +
+            (velocity_y > 0) * strides[3] + paddle1_y * strides[4] + paddle2_y * strides[5] - offset)
+
+def decode_states(index):
+    # inverse of encode_states: (ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y) arrays
+    strides = get_state_strides()
+    index = np.asarray(index, dtype=np.int64)
+    ball_x, rest = np.divmod(index, strides[0])
+    ball_y, rest = np.divmod(rest, strides[1])
+    velocity_x, rest = np.divmod(rest, strides[2])
+    velocity_y, rest = np.divmod(rest, strides[3])
+    paddle1_y, paddle2_y = np.divmod(rest, strides[4])
+    return (ball_x, ball_y, 2 * velocity_x - 1, 2 * velocity_y - 1,
+            paddle1_y + globals.args.paddle_size, paddle2_y + globals.args.paddle_size)
+
+def flip_state(state):
+    # the top-bottom mirror image; a paddle at y spans rows y - paddle_size to y
+    paddle_flip = globals.args.board_height - 1 + globals.args.paddle_size
+    return (state[0], globals.args.board_height - 1 - state[1], state[2], -state[3],
+            state[4], paddle_flip - state[5], state[6], paddle_flip - state[7])
+
+def flip_states(ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y, flipped):
+    # vectorized flip_state of the states where flipped is set
+    paddle_flip = globals.args.board_height - 1 + globals.args.paddle_size
+    return (ball_x, np.where(flipped, globals.args.board_height - 1 - ball_y, ball_y),
+            velocity_x, np.where(flipped, -velocity_y, velocity_y),
+            np.where(flipped, paddle_flip - paddle1_y, paddle1_y), np.where(flipped, paddle_flip - paddle2_y, paddle2_y))
+
+class SymmetricDict(dict):
+    """Dict store keyed by canonical (state, action) pairs.
+
+    A state whose ball moves up is stored as its top-bottom mirror image with
+    UP and DOWN swapped, so both images share one entry. That only holds when
+    the adversary plays mirror images alike: random and greedy do,
+    almost_perfect does not.
+    """
+
+    def canonical(self, key):
+        state, action = key
+        if state[3] < 0:
+            return flip_state(state), FLIPPED_ACTIONS[action]
+        return key
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, self.canonical(key))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, self.canonical(key), value)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, self.canonical(key))
+
+    def best_action(self, state, legal_actions):
+        # main.best_action with the state canonicalized once for all actions
+        flipped = state[3] < 0
+        if flipped:
+            state = flip_state(state)
+        best_action = None
+        max_value = -99999
+        for action in legal_actions:
+            key = (state, FLIPPED_ACTIONS[action] if flipped else action)
+            value = dict.get(self, key)
+            if value is None:
+                value = 0.0
+                dict.__setitem__(self, key, value)
+            if value > max_value:
+                max_value = value
+                best_action = action
+        return best_action
+
+class QTable(object):
+    """Dense Q store: a float32 array of shape (num_states, len(ACTIONS)).
+
+    Supports the same Q[(state, action)] protocol as the dict store, so the
+    existing training code works unchanged with either one. A symmetric table
+    canonicalizes like SymmetricDict and has half the rows.
+    """
+
+    def __init__(self, values=None, symmetric=False):
+        if values is None:
+            values = np.zeros((get_num_rows(symmetric), len(ACTIONS)), dtype=np.float32)
+        self.values = values
+        self.symmetric = symmetric
+        self.strides = get_state_strides(symmetric)
+        self.offset = globals.args.paddle_size * (self.strides[4] + self.strides[5])
+
+    def locate(self, state):
+        # row of state, and whether it is stored mirrored with UP and DOWN swapped;
+        # encode_state inlined, this runs for every lookup
+        flipped = self.symmetric and state[3] < 0
+        if flipped:
+            state = flip_state(state)
+        strides = self.strides
+        return (state[0] * strides[0] + state[1] * strides[1] + (state[2] > 0) * strides[2] +
+                (state[3] > 0) * strides[3] + state[5] * strides[4] + state[7] * strides[5] - self.offset), flipped
+
+    def locate_states(self, ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y):
+        # vectorized locate
+        flipped = (velocity_y < 0) & self.symmetric
+        fields = flip_states(ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y, flipped)
+        return encode_states(*fields, strides=self.strides), flipped
+
+    def best_actions(self, ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y):
+        # vectorized best_action: indices into ACTIONS
+        rows, flipped = self.locate_states(ball_x, ball_y, velocity_x, velocity_y, paddle1_y, paddle2_y)
+        values = self.values[rows]
+        values = np.where(flipped[:, None], values[:, FLIPPED_ACTION_INDEX], values)
+        return values.argmax(axis=1)
+
+    def __getitem__(self, key):
+        state, action = key
+        row, flipped = self.locate(state)
+        action_index = ACTION_INDEX[FLIPPED_ACTIONS[action] if flipped else action]
+        return self.values.item(row, action_index)
+
+    def __setitem__(self, key, value):
+        state, action = key
+        row, flipped = self.locate(state)
+        action_index = ACTION_INDEX[FLIPPED_ACTIONS[action] if flipped else action]
+        self.values[row, action_index] = value
+
+    def __contains__(self, key):
+        # every entry is preallocated and starts at 0.0, like a fresh dict entry
+        return True
+
+    def __len__(self):
+        return self.values.size
+
+    def best_action(self, state, legal_actions):
+        index, flipped = self.locate(state)
+        # three scalar item() reads, like update(), instead of a row view and np.argmax
+        values = self.values
+        up, stay, down = values.item(index, 0), values.item(index, 1), values.item(index, 2)
+        if flipped:
+            up, down = down, up
+        if len(legal_actions) == len(ACTIONS):
+            # the first maximum in ACTIONS order, same tie-break as the dict scan
+            if up >= stay and up >= down:
+                return "UP"
+            return "STAY" if stay >= down else "DOWN"
+        row = (up, stay, down)
+        return max(legal_actions, key=lambda action: row[ACTION_INDEX[action]])
+
+    def best_row_action(self, index):
+        # best_action by row and action index, for a table that is not symmetric;
+        # the compact engine, its only caller, rejects symmetric tables up front
+        values = self.values
+        up, stay, down = values.item(index, 0), values.item(index, 1), values.item(index, 2)
+        if up >= stay and up >= down:
+            return 0
+        return 1 if stay >= down else 2
+
+    def update(self, state, action, reward, next_state, learning_rate, discount):
+        # returns the change of Q(state, action)
+        (index, flipped), (next_index, _) = self.locate(state), self.locate(next_state)
+        action_index = ACTION_INDEX[FLIPPED_ACTIONS[action] if flipped else action]
+        return self.update_row(index, action_index, reward, next_index, learning_rate, discount)
+
+    def update_row(self, index, action_index, reward, next_index, learning_rate, discount):
+        # update by row and action index; returns the change of the value
+        values = self.values
+        value = values.item(index, action_index)
+        # scalar item() reads are much cheaper than building a row view for .max()
+        target = reward + discount * max(values.item(next_index, 0), values.item(next_index, 1), values.item(next_index, 2))
+        delta = learning_rate * (target - value)
+        values[index, action_index] = value + delta
+        return delta
+
+    def nbytes(self):
+        return self.values.nbytes
+
+def make_q_table(q_store, symmetric=False):
+    if q_store == "tiles":
+        return TileCodingQ(globals.args.num_tilings, globals.args.num_tiles)
+    if q_store == "array":
+        return QTable(symmetric=symmetric)
+    if symmetric:
+        return SymmetricDict()
+    return {}
@@ -0,0 +1,206 @@
+import sys
+
+import numpy as np
+
+# Global variables
+import globals
+
+from pong import ACTIONS, WHITE, BLACK
+
+def get_q_value(Q, state, action):
+    if (state, action) in Q:
+        return Q[(state, action)]
+    return 0.0
+
+def get_text_lines(Q, state, games_won, games_lost, debug):
+    # the status lines shown in the corner of every frame
+    lines = [
+        "G: " + str(games_won + games_lost) + " W: " + str(games_won) + " L: " + str(games_lost),
+        "Alpha: " + str(globals.args.learning_rate),
+        "Gamma: " + str(globals.args.discount),
+        "Epsilon: " + str(globals.args.epsilon),
+        "Agent strategy: " + str(globals.args.agent_strategy),
+        "Adversary strategy: " + str(globals.args.adversary_strategy),
+    ]
+    if debug:
+        for action in ACTIONS:
+            lines.append(action + ": " + str(get_q_value(Q, state, action)))
+    return lines
+
+class PygameRenderer(object):
+    """Draws the game in a pygame window.
+
+    pygame is imported, and the window and fonts created, only when the first
+    renderer is built. Each frame repaints only the rectangles whose content
+    changed since the previous one: the old and new places of the ball and
+    paddles and any text that reads differently.
+    """
+
+    def __init__(self, scale_factor=10):
+        import pygame
+        self.pygame = pygame
+        self.scale_factor = scale_factor
+        self.window_width = (globals.args.board_width - 1) * scale_factor
+        self.window_height = globals.args.board_height * scale_factor
+
+        pygame.init()
+        self.canvas = pygame.display.set_mode((self.window_width, self.window_height))
+        self.very_small = pygame.font.SysFont("Sitka", int(1.5 * scale_factor))
+        self.big = pygame.font.SysFont("Sitka", 4 * scale_factor)
+
+        self.shapes = {}
+        self.texts = {}
+        self.first_frame = True
+
+    def get_shapes(self, state):
+        ball_x, ball_y = state[0], state[1]
+        paddle1_x, paddle1_y = state[4], state[5]
+        paddle2_x, paddle2_y = state[6], state[7]
+        scale_factor, paddle_size = self.scale_factor, globals.args.paddle_size
+        Rect = self.pygame.Rect
+        return {
+            "ball": Rect(ball_x * scale_factor, ball_y * scale_factor, scale_factor, scale_factor),
+            "paddle1": Rect(paddle1_x * scale_factor, (paddle1_y - paddle_size) * scale_factor,
+                            scale_factor, paddle_size * scale_factor),
+            "paddle2": Rect((paddle2_x - 1) * scale_factor, (paddle2_y - paddle_size) * scale_factor,
+                            scale_factor, paddle_size * scale_factor),
+        }
+
+    def get_texts(self, Q, state, agent_score, adversary_score, games_won, games_lost, debug):
+        # (font, position) -> string
+        scale_factor = self.scale_factor
+        texts = {
+            ("big", (self.window_width / 2 - 3 * scale_factor, scale_factor)): str(adversary_score),
+            ("big", (self.window_width / 2 + 2 * scale_factor, scale_factor)): str(agent_score),
+        }
+        for i, line in enumerate(get_text_lines(Q, state, games_won, games_lost, debug)):
+            texts[("very_small", (0, i * 10))] = line
+        return texts
+
+    def paint(self):
+        # the whole scene, clipped by the caller to one dirty rectangle
+        pygame = self.pygame
+        self.canvas.fill(BLACK)
+        pygame.draw.line(self.canvas, WHITE, [self.window_width / 2, 0], [self.window_width / 2, self.window_height], 1)
+        for rect in self.shapes.values():
+            pygame.draw.rect(self.canvas, WHITE, rect)
+        for text, surface, rect in self.texts.values():
+            self.canvas.blit(surface, rect)
+
+    def draw(self, Q, state, agent_score, adversary_score, games_won, games_lost, debug=False):
+        dirty = []
+
+        shapes = self.get_shapes(state)
+        for name, rect in shapes.items():
+            if self.shapes.get(name) != rect:
+                if name in self.shapes:
+                    dirty.append(self.shapes[name])
+                dirty.append(rect)
+        self.shapes = shapes
+
+        texts = self.get_texts(Q, state, agent_score, adversary_score, games_won, games_lost, debug)
+        for key in list(self.texts):
+            if key not in texts:
+                dirty.append(self.texts.pop(key)[2])
+        for (font, position), text in texts.items():
+            cached = self.texts.get((font, position))
+            if cached is not None and cached[0] == text:
+                continue
+            surface = getattr(self, font).render(text, 1, WHITE)
+            rect = surface.get_rect(topleft=position)
+            if cached is not None:
+                dirty.append(cached[2])
+            dirty.append(rect)
+            self.texts[(font, position)] = (text, surface, rect)
+
+        if self.first_frame:
+            dirty = [self.canvas.get_rect()]
+            self.first_frame = False
+
+        for rect in dirty:
+            self.canvas.set_clip(rect)
+            self.paint()
+        self.canvas.set_clip(None)
+
+        # keep the window responsive between frames
+        self.pygame.event.pump()
+        self.pygame.display.update(dirty)
+
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+
+def move_cursor(row, col):
+    # ANSI rows and columns start at 1
+    return "\x1b[%d;%dH" % (row + 1, col + 1)
+
+class TerminalRenderer(object):
+    """Draws the game with ANSI escapes.
+
+    The board is kept as a preallocated character grid; each frame writes, in
+    a single call, only the status lines and cells that differ from the
+    previous frame.
+    """
+
+    def __init__(self, out=None):
+        # None writes to whatever sys.stdout is at draw time
+        self.out = out
+        # status lines, including the debug Q-values, then the board between two walls
+        self.num_text_lines = len(get_text_lines({}, None, 0, 0, True))
+        self.board_row = self.num_text_lines + 1
+        self.grid = np.full((globals.args.board_height, globals.args.board_width), ord(" "), dtype=np.uint8)
+        self.previous = None
+        self.lines = [None] * self.num_text_lines
+
+    def fill_grid(self, state):
+        ball_x, ball_y = state[0], state[1]
+        paddle1_x, paddle1_y = state[4], state[5]
+        paddle2_x, paddle2_y = state[6], state[7]
+        paddle_size = globals.args.paddle_size
+
+        self.grid.fill(ord(" "))
+        self.grid[paddle1_y - paddle_size + 1:paddle1_y + 1, paddle1_x] = ord("|")
+        self.grid[paddle2_y - paddle_size + 1:paddle2_y + 1, paddle2_x] = ord("|")
+        self.grid[ball_y, ball_x] = ord("o")
+
+    def draw(self, Q, state, agent_score, adversary_score, games_won, games_lost, debug=False):
+        frame = []
+        if self.previous is None:
+            wall = "*" * globals.args.board_width
+            frame.append(CLEAR_SCREEN)
+            frame.append(move_cursor(self.board_row - 1, 0) + wall)
+            frame.append(move_cursor(self.board_row + globals.args.board_height, 0) + wall)
+
+        lines = get_text_lines(Q, state, games_won, games_lost, debug)
+        lines += [""] * (self.num_text_lines - len(lines))
+        lines[0] += "  Score: " + str(adversary_score) + " - " + str(agent_score)
+        for row, line in enumerate(lines):
+            if line != self.lines[row]:
+                frame.append(move_cursor(row, 0) + line + CLEAR_LINE)
+                self.lines[row] = line
+
+        self.fill_grid(state)
+        if self.previous is None:
+            rows, cols = np.nonzero(self.grid != ord(" "))
+            self.previous = np.empty_like(self.grid)
+        else:
+            rows, cols = np.nonzero(self.grid != self.previous)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            frame.append(move_cursor(self.board_row + row, col) + chr(self.grid[row, col]))
+        self.previous[:] = self.grid
+
+        # park the cursor under the board so other output does not land on it
+        frame.append(move_cursor(self.board_row + globals.args.board_height + 1, 0))
+        out = self.out if self.out is not None else sys.stdout
+        out.write("".join(frame))
+        out.flush()
+
+renderers = {}
+
+def get_renderer(kind):
+    # one renderer per kind for the whole process, built on first use
+    if kind not in renderers:
+        if kind == "term":
+            renderers[kind] = TerminalRenderer()
+        else:
+            renderers[kind] = PygameRenderer()
+    return renderers[kind]
@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+
+# Global variables
+import globals
+
+from qtable import ACTION_INDEX, FLIPPED_ACTION_INDEX
+from approx import TileCodingQ
+
+# One column per state field, as small as the board allows
+STATE_DTYPES = [np.int16, np.int16, np.int8, np.int8, np.int16, np.int16, np.int16, np.int16]
+STATE_COLUMNS = ["ball_x", "ball_y", "velocity_x", "velocity_y", "paddle1_x", "paddle1_y", "paddle2_x", "paddle2_y"]
+
+def get_column_dtypes():
+    dtypes = []
+    for prefix in ("", "next_"):
+        dtypes += [(prefix + name, dtype) for name, dtype in zip(STATE_COLUMNS, STATE_DTYPES)]
+    return dtypes + [("action", np.int8), ("reward", np.float32), ("done", np.bool_)]
+
+def get_fields(columns, prefix=""):
+    return (columns[prefix + "ball_x"], columns[prefix + "ball_y"], columns[prefix + "velocity_x"],
+            columns[prefix + "velocity_y"], columns[prefix + "paddle1_y"], columns[prefix + "paddle2_y"])
+
+def locate_columns(Q, columns, prefix=""):
+    # the Q rows of a batch of states, see QTable.locate_states
+    return Q.locate_states(*get_fields(columns, prefix))
+
+class SumTree(object):
+    """Binary tree of priority sums over capacity leaves, for sampling in O(log n)."""
+
+    def __init__(self, capacity):
+        self.num_leaves = 1
+        while self.num_leaves < capacity:
+            self.num_leaves *= 2
+        self.depth = self.num_leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.num_leaves, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, leaves):
+        return self.tree[leaves + self.num_leaves]
+
+    def set(self, leaves, values):
+        nodes = np.asarray(leaves) + self.num_leaves
+        self.tree[nodes] = values
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def set_one(self, leaf, value):
+        # scalar version of set(), much cheaper for a single leaf
+        tree = self.tree
+        node = leaf + self.num_leaves
+        tree[node] = value
+        while node > 1:
+            node //= 2
+            tree[node] = tree.item(2 * node) + tree.item(2 * node + 1)
+
+    def find(self, masses):
+        # the leaf whose cumulative range holds each mass, one tree level per step for the whole batch
+        nodes = np.ones(len(masses), dtype=np.int64)
+        masses = masses.copy()
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            go_right = masses > left
+            masses -= left * go_right
+            nodes = 2 * nodes + go_right
+        return nodes - self.num_leaves
+
+class ReplayBuffer(object):
+    """Ring buffer of transitions stored column by column in NumPy arrays.
+
+    With a spill_dir, every chunk_size transitions added are also written to
+    spill_dir/chunk_NNNNNN/<column>.npy, which load_chunk() maps back in
+    without reading it, so recorded games can be reused across experiments.
+    """
+
+    def __init__(self, capacity, spill_dir=None, chunk_size=65536, prioritized=False, alpha=0.6):
+        self.capacity = capacity
+        self.columns = dict((name, np.zeros(capacity, dtype=dtype)) for name, dtype in get_column_dtypes())
+        # priorities ** alpha, only kept for prioritized sampling
+        self.priorities = SumTree(capacity) if prioritized else None
+        self.alpha = alpha
+        self.max_priority = 1.0
+        self.size = 0
+        self.position = 0
+
+        self.spill_dir = spill_dir
+        # a chunk is written from the ring, so it cannot be larger than the ring
+        self.chunk_size = min(chunk_size, capacity)
+        self.num_chunks = 0
+        self.unspilled = 0
+        if spill_dir is not None:
+            if not os.path.isdir(spill_dir):
+                os.makedirs(spill_dir)
+            self.num_chunks = len(list_chunks(spill_dir))
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        slot = self.position
+        for i, name in enumerate(STATE_COLUMNS):
+            self.columns[name][slot] = state[i]
+            self.columns["next_" + name][slot] = next_state[i]
+        self.columns["action"][slot] = ACTION_INDEX[action]
+        self.columns["reward"][slot] = reward
+        self.columns["done"][slot] = done
+        if self.priorities is not None:
+            self.priorities.set_one(slot, self.max_priority ** self.alpha)
+        self.advance(1)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Append N transitions: (N, 8) state arrays and action indices into ACTIONS."""
+        count = len(actions)
+        if count > self.capacity:
+            states, actions, rewards = states[-self.capacity:], actions[-self.capacity:], rewards[-self.capacity:]
+            next_states, dones = next_states[-self.capacity:], dones[-self.capacity:]
+            count = self.capacity
+        slots = (self.position + np.arange(count)) % self.capacity
+
+        for i, name in enumerate(STATE_COLUMNS):
+            self.columns[name][slots] = states[:, i]
+            self.columns["next_" + name][slots] = next_states[:, i]
+        self.columns["action"][slots] = actions
+        self.columns["reward"][slots] = rewards
+        self.columns["done"][slots] = dones
+        if self.priorities is not None:
+            self.priorities.set(slots, self.max_priority ** self.alpha)
+        self.advance(count)
+
+    def advance(self, count):
+        # new transitions got the highest priority: they are replayed at least once before their error is known
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+        if self.spill_dir is not None:
+            self.unspilled += count
+            while self.unspilled >= self.chunk_size:
+                self.spill(self.chunk_size, self.unspilled - self.chunk_size)
+                self.unspilled -= self.chunk_size
+
+    def spill(self, count, newer):
+        # write the count transitions that precede the newest `newer` ones
+        end = (self.position - newer) % self.capacity
+        slots = (end - count + np.arange(count)) % self.capacity
+        chunk_dir = os.path.join(self.spill_dir, "chunk_%06d" % self.num_chunks)
+        os.makedirs(chunk_dir)
+        for name, column in self.columns.items():
+            np.save(os.path.join(chunk_dir, name + ".npy"), column[slots])
+        self.num_chunks += 1
+
+    def flush(self):
+        # spill what is left over, e.g. at the end of training
+        if self.spill_dir is not None and self.unspilled > 0:
+            self.spill(min(self.unspilled, self.size), 0)
+            self.unspilled = 0
+
+    def sample(self, batch_size, rng=np.random, beta=0.4):
+        """Draw batch_size transitions, by priority for a prioritized buffer.
+
+        Returns the slot indices, the columns and importance-sampling weights,
+        which are all 1 for uniform sampling.
+        """
+        if self.priorities is not None:
+            total = self.priorities.total()
+            # one draw per equal slice of the total priority mass
+            masses = (np.arange(batch_size) + rng.uniform(size=batch_size)) * (total / batch_size)
+            indices = np.minimum(self.priorities.find(masses), self.size - 1)
+            probabilities = self.priorities.get(indices) / total
+            weights = (self.size * probabilities) ** -beta
+            weights /= weights.max()
+        else:
+            indices = rng.randint(0, self.size, batch_size)
+            weights = np.ones(batch_size)
+        batch = dict((name, column[indices]) for name, column in self.columns.items())
+        return indices, batch, weights
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + 1e-6
+        self.priorities.set(indices, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+def replay_q_update(Q, batch, weights, learning_rate, discount):
+    """One vectorized Q-learning pass over a batch of transitions.
+
+    Same target as main.update_q: the next state is bootstrapped even after a
+    final state, whose row is never updated and stays 0. When a (state, action)
+    pair is drawn twice the last update wins. Returns the TD errors.
+    """
+    if isinstance(Q, TileCodingQ):
+        return Q.batch_update(get_fields(batch), batch["action"].astype(np.int64), batch["reward"],
+                              get_fields(batch, "next_"), weights, learning_rate, discount)
+    index, flipped = locate_columns(Q, batch)
+    next_index, _ = locate_columns(Q, batch, "next_")
+    actions = batch["action"].astype(np.int64)
+    actions = np.where(flipped, FLIPPED_ACTION_INDEX[actions], actions)
+    values = Q.values[index, actions]
+    td_errors = batch["reward"] + discount * Q.values[next_index].max(axis=1) - values
+    Q.values[index, actions] = values + learning_rate * weights * td_errors
+    return td_errors
+
+def replay(Q, replay_buffer, batch_size, rng=np.random):
+    indices, batch, weights = replay_buffer.sample(batch_size, rng)
+    td_errors = replay_q_update(Q, batch, weights, globals.args.learning_rate, globals.args.discount)
+    if replay_buffer.priorities is not None:
+        replay_buffer.update_priorities(indices, td_errors)
+    return td_errors
+
+def list_chunks(spill_dir):
+    return sorted(name for name in os.listdir(spill_dir) if name.startswith("chunk_"))
+
+def load_chunk(spill_dir, chunk):
+    # the columns of one spilled chunk, memory mapped
+    chunk_dir = os.path.join(spill_dir, chunk)
+    return dict((name, np.load(os.path.join(chunk_dir, name + ".npy"), mmap_mode="r"))
+                for name, _ in get_column_dtypes())
+
+def load_replay_buffer(spill_dir, capacity):
+    """A ReplayBuffer filled with the most recent spilled transitions."""
+    replay_buffer = ReplayBuffer(capacity)
+    for chunk in list_chunks(spill_dir):
+        columns = load_chunk(spill_dir, chunk)
+        states = np.stack([columns[name] for name in STATE_COLUMNS], axis=1)
+        next_states = np.stack([columns["next_" + name] for name in STATE_COLUMNS], axis=1)
+        replay_buffer.add_batch(states, columns["action"], columns["reward"], next_states, columns["done"])
+    return replay_buffer
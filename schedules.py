@@ -0,0 +1,81 @@
+# Global variables
+import globals
+
+class Schedule(object):
+    """A hyperparameter decaying from start to end over `episodes` episodes.
+
+    "linear" goes down in equal steps, "exponential" by an equal factor per
+    episode and "inverse_time" as start / (1 + k * episode), with k such that
+    it reaches end on time. All of them stay at end afterwards; "constant"
+    stays at start.
+    """
+
+    def __init__(self, kind, start, end, episodes):
+        if kind in ("exponential", "inverse_time") and (start <= 0 or end <= 0):
+            raise ValueError("a %s schedule needs positive start and end values" % kind)
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.episodes = max(episodes, 1)
+
+    def value(self, episode):
+        if self.kind == "constant":
+            return self.start
+        progress = min(episode / float(self.episodes), 1.0)
+        if self.kind == "linear":
+            return self.start + (self.end - self.start) * progress
+        if self.kind == "exponential":
+            return self.start * (self.end / float(self.start)) ** progress
+        return self.start / (1.0 + (self.start / float(self.end) - 1.0) * progress)
+
+def make_schedules():
+    # (epsilon, learning rate) schedules, from the values configured before training changed them
+    episodes = globals.args.decay_episodes or globals.args.train_episodes
+    return (Schedule(globals.args.epsilon_schedule, globals.args.epsilon_start, globals.args.epsilon_end, episodes),
+            Schedule(globals.args.learning_rate_schedule, globals.args.learning_rate_start,
+                     globals.args.learning_rate_end, episodes))
+
+def apply_schedules(schedules, episode):
+    # the training code reads both from globals.args; epsilon_start and
+    # learning_rate_start keep the configured values
+    epsilon_schedule, learning_rate_schedule = schedules
+    globals.args.epsilon = epsilon_schedule.value(episode)
+    globals.args.learning_rate = learning_rate_schedule.value(episode)
+
+class EarlyStop(object):
+    """Decides, at every evaluation, whether training has converged.
+
+    With patience > 0, training stops when the last `patience` evaluation
+    scores did not beat the best earlier one by more than min_delta. With
+    q_tolerance > 0, it stops when no Q update since the previous evaluation
+    changed a value by q_tolerance or more.
+    """
+
+    def __init__(self, patience, min_delta, q_tolerance):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.q_tolerance = q_tolerance
+        self.max_delta = 0.0
+        self.updates = 0
+
+    def record_delta(self, delta):
+        # called with the change of every Q update
+        self.updates += 1
+        if abs(delta) > self.max_delta:
+            self.max_delta = abs(delta)
+
+    def should_stop(self, eval_scores):
+        """eval_scores: the evaluation scores known so far, in order."""
+        converged = False
+        if self.patience > 0 and len(eval_scores) > self.patience:
+            converged = max(eval_scores[-self.patience:]) <= max(eval_scores[:-self.patience]) + self.min_delta
+        if self.q_tolerance > 0 and self.updates > 0 and self.max_delta < self.q_tolerance:
+            converged = True
+        self.max_delta = 0.0
+        self.updates = 0
+        return converged
+
+def make_early_stop():
+    if globals.args.early_stop_patience <= 0 and globals.args.q_tolerance <= 0:
+        return None
+    return EarlyStop(globals.args.early_stop_patience, globals.args.early_stop_min_delta, globals.args.q_tolerance)
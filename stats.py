@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+# Global variables
+import globals
+
+# One record per flush. The log is these records back to back with no header,
+# so it can be appended to by resumed runs and read with np.memmap.
+STATS_DTYPE = np.dtype([
+    ("episode", "<i8"),
+    ("mean", "<f8"),
+    ("min", "<f8"),
+    ("max", "<f8"),
+    ("moving_average", "<f8"),
+    ("win_rate", "<f8"),
+    ("eval_score", "<f8"),
+])
+
+class PrintStats(object):
+    """The default sink: prints every episode and keeps every score in train_scores."""
+
+    def __init__(self):
+        self.train_scores = []
+
+    def episode_done(self, episode, score, won, lost):
+        print("Episode %6d / %6d" % (episode, globals.args.train_episodes))
+        self.train_scores.append(score)
+
+    def eval_done(self, episode, score):
+        pass
+
+    def close(self):
+        pass
+
+class StatsLog(object):
+    """Streams episode statistics to an append-only binary log in O(1) memory.
+
+    Every `every` episodes one STATS_DTYPE record is appended to out: the
+    mean, min and max score of those episodes, an exponential moving average
+    of the score over about `window` episodes, the share of points won and
+    the last evaluation score (NaN when there was none), and one progress
+    line is printed. Nothing is kept per episode.
+    """
+
+    def __init__(self, out, every, window=100):
+        self.out = out
+        self.every = every
+        self.smoothing = 2.0 / (window + 1)
+        self.moving_average = None
+        self.record = np.zeros(1, dtype=STATS_DTYPE)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.won = 0
+        self.lost = 0
+        self.eval_score = float("nan")
+
+    def episode_done(self, episode, score, won, lost):
+        self.episode = episode
+        self.count += 1
+        self.total += score
+        self.min = min(self.min, score)
+        self.max = max(self.max, score)
+        self.won += won
+        self.lost += lost
+        if self.moving_average is None:
+            self.moving_average = score
+        else:
+            self.moving_average += self.smoothing * (score - self.moving_average)
+        if self.count >= self.every:
+            self.write(episode)
+
+    def eval_done(self, episode, score):
+        self.eval_score = score
+
+    def write(self, episode):
+        record = self.record[0]
+        record["episode"] = episode
+        record["mean"] = self.total / self.count
+        record["min"] = self.min
+        record["max"] = self.max
+        record["moving_average"] = self.moving_average
+        record["win_rate"] = self.won / float(self.won + self.lost) if self.won + self.lost > 0 else float("nan")
+        record["eval_score"] = self.eval_score
+        self.out.write(self.record.tobytes())
+        self.out.flush()
+        print("Episode %6d / %6d  mean %8.3f  moving average %8.3f  win rate %.3f" % (
+            episode, globals.args.train_episodes, record["mean"], record["moving_average"], record["win_rate"]))
+        self.reset()
+
+    def close(self):
+        if self.count > 0:
+            self.write(self.episode)
+        self.out.close()
+
+def make_stats_sink(path, every):
+    if path is None:
+        return PrintStats()
+    return StatsLog(open(path, "ab"), every)
+
+def load_stats(path):
+    """Map a stats log into memory without reading it."""
+    if os.path.getsize(path) == 0:
+        # mmap cannot map an empty file
+        return np.zeros(0, dtype=STATS_DTYPE)
+    return np.memmap(path, dtype=STATS_DTYPE, mode="r")
@@ -0,0 +1,258 @@
+# Hyperparameter sweep: runs main.py trainings over a search space in a process
+# pool and streams their evaluation scores into an SQLite database.
+#
+#   python sweep.py --param learning_rate=0.1,0.2,0.4 --param discount=0.8,0.9,0.99 \
+#       --out sweep.db -- --agent_strategy epsilon_greedy --train_episodes 5000
+#   python sweep.py --search random --trials 30 --param learning_rate=0.01:0.5:log \
+#       --param epsilon=0.01:0.3 --param board_height=15,21,31 -- --agent_strategy epsilon_greedy
+#
+# A --param is a list of values (grid and random search) or, for random search,
+# a low:high range sampled uniformly, or log-uniformly with :log; a range of
+# ints samples ints. Arguments after -- go to main.py for every trial.
+#
+# Trials train with main.serial_q_learning, so main.py's own options, early
+# stopping and schedules included, apply to them. Early stopping across trials:
+# at the first evaluation after --min_episodes, then after every --reduction
+# times as many episodes, a trial's mean of its last --window evaluations is
+# compared with the trials that already reached the same episode count, and
+# the trial stops when it is below their median.
+import os, sys, time, json, math, random, sqlite3, itertools
+import multiprocessing as mp
+from argparse import ArgumentParser
+
+# Global variables
+import globals
+
+from main import parse_args, serial_q_learning
+from policies import reset_adversaries
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    trial_id INTEGER PRIMARY KEY,
+    params TEXT,
+    status TEXT,
+    episodes INTEGER,
+    score REAL,
+    seconds REAL
+);
+CREATE TABLE IF NOT EXISTS eval_scores (
+    trial_id INTEGER,
+    episode INTEGER,
+    score REAL
+);
+CREATE TABLE IF NOT EXISTS rungs (
+    episodes INTEGER,
+    trial_id INTEGER,
+    score REAL
+);
+"""
+
+# main.py options trials cannot honour, with the reason
+UNSUPPORTED_FLAGS = [
+    ("--save_q", "trials train from scratch, without checkpoints"),
+    ("--load_q", "trials train from scratch, without checkpoints"),
+    ("--workers", "each trial trains in a single process"),
+    ("--actors", "each trial trains in a single process"),
+    ("--eval_workers", "pool processes cannot start processes of their own"),
+    ("--stats_log", "trials running at once would write into one file"),
+    ("--profile", "trials running at once would write into one file"),
+    ("--profile_pstats", "trials running at once would write into one file"),
+    ("--replay_dir", "trials running at once would write into one directory"),
+    ("--verbose", "trials do not display their games"),
+]
+
+def connect(path):
+    # trials write from several processes; wait for each other's transactions instead of failing
+    db = sqlite3.connect(path, timeout=60)
+    db.executescript(SCHEMA)
+    return db
+
+def parse_param(text):
+    # "name=v1,v2" -> (name, [v1, v2]); "name=low:high[:log]" -> (name, (low, high, log))
+    name, values = text.split("=", 1)
+    if ":" in values:
+        parts = values.split(":")
+        low, high = parse_value(parts[0]), parse_value(parts[1])
+        return name, (low, high, len(parts) > 2 and parts[2] == "log")
+    return name, [parse_value(value) for value in values.split(",")]
+
+def parse_value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+def sample(space, rng):
+    if isinstance(space, list):
+        return rng.choice(space)
+    low, high, log = space
+    if isinstance(low, int) and isinstance(high, int) and not log:
+        return rng.randint(low, high)
+    if log:
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    return rng.uniform(low, high)
+
+def make_trials(params, search, num_trials, seed):
+    # list of {name: value} configurations
+    names = [name for name, _ in params]
+    if search == "grid":
+        for name, space in params:
+            if not isinstance(space, list):
+                raise ValueError("grid search needs a list of values for %s" % name)
+        return [dict(zip(names, values)) for values in itertools.product(*[space for _, space in params])]
+    rng = random.Random(seed)
+    return [dict((name, sample(space, rng)) for name, space in params) for _ in range(num_trials)]
+
+def get_rungs(min_episodes, reduction, train_episodes):
+    # episode counts at which trials are compared
+    rungs = []
+    episodes = min_episodes
+    while min_episodes > 0 and episodes < train_episodes:
+        rungs.append(episodes)
+        episodes *= reduction
+    return rungs
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+def report_rung(db, trial_id, episodes, score):
+    # records score at this rung and returns whether the trial is below the median of the ones before it
+    with db:
+        scores = [row[0] for row in db.execute("SELECT score FROM rungs WHERE episodes = ?", (episodes,))]
+        db.execute("INSERT INTO rungs VALUES (?, ?, ?)", (episodes, trial_id, score))
+    return len(scores) > 0 and score < median(scores)
+
+def get_trial_argv(config, main_argv):
+    argv = list(main_argv)
+    for name, value in sorted(config.items()):
+        argv += ["--" + name, str(value)]
+    return argv
+
+class TrialMonitor(object):
+    """serial_q_learning's on_eval callback for one trial.
+
+    Streams the trial's evaluation scores into the database and, at the first
+    evaluation after each rung's episode count, reports the mean of the last
+    `window` scores; the trial stops when it falls below the median.
+    """
+
+    def __init__(self, db, trial_id, rungs, window):
+        self.db = db
+        self.trial_id = trial_id
+        self.rungs = list(rungs)
+        self.window = window
+        self.recorded = 0
+        self.stopped = False
+
+    def __call__(self, train_ep, eval_scores):
+        with self.db:
+            for i in range(self.recorded, len(eval_scores)):
+                self.db.execute("INSERT INTO eval_scores VALUES (?, ?, ?)",
+                                (self.trial_id, i * globals.args.eval_every, eval_scores[i]))
+        self.recorded = len(eval_scores)
+
+        while self.rungs and train_ep + 1 >= self.rungs[0] and eval_scores:
+            rung = self.rungs.pop(0)
+            recent = eval_scores[-self.window:]
+            if report_rung(self.db, self.trial_id, rung, sum(recent) / len(recent)):
+                self.stopped = True
+        return self.stopped
+
+def run_trial(task):
+    """Train one configuration, streaming its evaluations to the database.
+
+    Returns (trial_id, status, episodes trained, last score).
+    """
+    trial_id, config, sweep_args, main_argv = task
+    globals.args = parse_args(get_trial_argv(config, main_argv))
+    if globals.args.seed is None:
+        globals.args.seed = sweep_args.seed + trial_id
+    random.seed(globals.args.seed)
+    reset_adversaries()
+
+    db = connect(sweep_args.out)
+    with db:
+        db.execute("INSERT INTO trials VALUES (?, ?, 'running', 0, NULL, NULL)",
+                   (trial_id, json.dumps(config, sort_keys=True)))
+
+    monitor = TrialMonitor(db, trial_id, get_rungs(sweep_args.min_episodes, sweep_args.reduction,
+                                                   globals.args.train_episodes), sweep_args.window)
+    start = time.time()
+    # the trial's progress goes to the database, not to the sweep's output
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        Q, train_scores, eval_scores, games_won, games_lost = serial_q_learning(monitor)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    status = "stopped" if monitor.stopped else "done"
+    # early stopping of either kind shortens train_episodes to the episodes trained
+    episodes = globals.args.train_episodes
+    recent = eval_scores[-sweep_args.window:]
+    final_score = sum(recent) / len(recent)
+    with db:
+        db.execute("UPDATE trials SET status = ?, episodes = ?, score = ?, seconds = ? WHERE trial_id = ?",
+                   (status, episodes, final_score, time.time() - start, trial_id))
+    db.close()
+    return trial_id, status, episodes, final_score
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--param", type = str, action = "append", default = [],
+                        help = "name=v1,v2,... or name=low:high[:log]; name is a main.py option")
+    parser.add_argument("--search", type = str, default = "grid", choices = ["grid", "random"])
+    parser.add_argument("--trials", type = int, default = 20,
+                        help = "Configurations drawn by random search")
+    parser.add_argument("--processes", type = int, default = mp.cpu_count(),
+                        help = "Trials run at once")
+    parser.add_argument("--out", type = str, default = "sweep.db",
+                        help = "SQLite database the trials and their scores go to")
+    parser.add_argument("--min_episodes", type = int, default = 500,
+                        help = "Episodes before the first early stopping check (0 disables early stopping)")
+    parser.add_argument("--reduction", type = int, default = 2,
+                        help = "Episode count factor between two early stopping checks")
+    parser.add_argument("--window", type = int, default = 3,
+                        help = "Evaluations averaged into a trial's score")
+    parser.add_argument("--seed", type = int, default = 0,
+                        help = "Seeds the random search; trial i trains with seed + i unless main.py gets --seed")
+    if "--" in sys.argv:
+        split = sys.argv.index("--")
+        sweep_args, main_argv = parser.parse_args(sys.argv[1:split]), sys.argv[split + 1:]
+    else:
+        sweep_args, main_argv = parser.parse_args(), []
+    # check the arguments once before starting the pool
+    configs = make_trials([parse_param(param) for param in sweep_args.param], sweep_args.search,
+                          sweep_args.trials, sweep_args.seed)
+    for config in configs:
+        trial_argv = get_trial_argv(config, main_argv)
+        for flag, reason in UNSUPPORTED_FLAGS:
+            if any(arg == flag or arg.startswith(flag + "=") for arg in trial_argv):
+                parser.error("%s is not supported in trials: %s" % (flag, reason))
+        parse_args(trial_argv)
+    db = connect(sweep_args.out)
+    if db.execute("SELECT COUNT(*) FROM trials").fetchone()[0] > 0:
+        parser.error("%s already holds a sweep, early stopping would compare against its trials" % sweep_args.out)
+    db.close()
+
+    tasks = [(trial_id, config, sweep_args, main_argv) for trial_id, config in enumerate(configs)]
+    # a fresh process per trial, so nothing cached by one trial leaks into the next
+    pool = mp.Pool(sweep_args.processes, maxtasksperchild=1)
+    results = []
+    for trial_id, status, episodes, score in pool.imap_unordered(run_trial, tasks):
+        print("Trial %4d  %-7s  episodes %6d  score %8.3f  %s" % (
+            trial_id, status, episodes, score, json.dumps(configs[trial_id], sort_keys=True)))
+        results.append((score, trial_id))
+    pool.close()
+    pool.join()
+
+    print("Best trials:")
+    for score, trial_id in sorted(results, reverse=True)[:5]:
+        print("%8.3f  %s" % (score, json.dumps(configs[trial_id], sort_keys=True)))